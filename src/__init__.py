@@ -1,15 +1,14 @@
-from . import app
 from . import catch_exceptions
 from . import configuration
-from . import download_models
-from . import modal_deployment_with_auth
-from . import bros
+from . import cache
 from . import data_model
-from . import ditod
 from . import extraction_formats
 from . import fast_trainer
+from . import metrics
 from . import model_configuration
 from . import ocr
+from . import output_formats
+from . import parallel
 from . import pdf_features
 from . import pdf_layout_analysis
 from . import pdf_token_type_labels
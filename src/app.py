@@ -1,43 +1,93 @@
-import os
-import subprocess
+import shutil
 import sys
+import tempfile
 from pathlib import Path
 
-import torch
 from fastapi import FastAPI, UploadFile, File, Form
-from fastapi.responses import PlainTextResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import PlainTextResponse, Response, JSONResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from starlette.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
 from starlette.responses import FileResponse
 
 from .catch_exceptions import catch_exceptions
-from .configuration import service_logger, OCR_SOURCE
-from .ocr.languages import supported_languages
-from .ocr.ocr_pdf import ocr_pdf
+from .configuration import service_logger, VGT_QUANTIZED
+from .environment_info import get_environment, get_info
+from .metrics.pipeline_metrics import get_metrics_registry
+from .metrics.profile_request import profile_request, get_pstats_path
+from .output_formats.segments_table import SEGMENTS_TABLE_MEDIA_TYPES
+from .output_formats.segments_table import get_segments_table_bytes, get_batch_segments_table_bytes
+from .ocr.ocr_pdf import ocr_pdf_path, run_in_ocr_pool
+from .pdf_layout_analysis.analyze_batch import analyze_batch
 from .pdf_layout_analysis.get_xml import get_xml
 from .pdf_layout_analysis.run_pdf_layout_analysis import analyze_pdf
-from .pdf_layout_analysis.run_pdf_layout_analysis_fast import analyze_pdf_fast
+from .pdf_layout_analysis.run_pdf_layout_analysis_auto import analyze_pdf_auto
+from .pdf_layout_analysis.run_pdf_layout_analysis_fast import analyze_pdf_fast, analyze_pdf_tokens
 from .text_extraction.get_text_extraction import get_text_extraction
 from .toc.get_toc import get_toc
 from .visualization.get_visualization import get_visualization
 
-service_logger.info(f"Is PyTorch using GPU: {torch.cuda.is_available()}")
-
 app = FastAPI()
 
 
 @app.get("/")
 async def root():
+    import torch
+
     return sys.version + " Using GPU: " + str(torch.cuda.is_available())
 
 
+@app.on_event("startup")
+async def probe_environment_on_startup():
+    await run_in_threadpool(get_environment)
+
+
 @app.get("/info")
-async def info():
-    return {
-        "sys": sys.version,
-        "tesseract_version": subprocess.run("tesseract --version", shell=True, text=True, capture_output=True).stdout,
-        "ocrmypdf_version": subprocess.run("ocrmypdf --version", shell=True, text=True, capture_output=True).stdout,
-        "supported_languages": supported_languages(),
-    }
+async def info(refresh: bool = False):
+    return await run_in_threadpool(get_info, refresh)
+
+
+@app.get("/metrics")
+async def metrics():
+    return Response(content=generate_latest(get_metrics_registry()), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/profile/{profile_id}")
+@catch_exceptions
+async def get_profile(profile_id: str):
+    pstats_path = get_pstats_path(profile_id)
+    if not pstats_path.exists():
+        raise FileNotFoundError(f"No profile {profile_id}")
+    return FileResponse(
+        path=pstats_path,
+        media_type="application/octet-stream",
+        filename=pstats_path.name,
+        background=BackgroundTask(pstats_path.unlink, missing_ok=True),
+    )
+
+
+async def run_analysis(profile: bool, function, *args, output_format: str = "json"):
+    if output_format != "json":
+        return await run_table_analysis(profile, output_format, function, *args)
+    if not profile:
+        return await run_in_threadpool(function, *args)
+    result, request_profile = await run_in_threadpool(profile_request, function, *args)
+    return JSONResponse(content=jsonable_encoder(result), headers=request_profile.get_headers())
+
+
+async def run_table_analysis(profile: bool, output_format: str, function, *args):
+    if output_format not in SEGMENTS_TABLE_MEDIA_TYPES:
+        raise ValueError(f"Unknown output format {output_format}, use json, arrow or parquet")
+    headers = {}
+    if profile:
+        result, request_profile = await run_in_threadpool(profile_request, function, *args)
+        headers = request_profile.get_headers()
+    else:
+        result = await run_in_threadpool(function, *args)
+    get_table_bytes = get_batch_segments_table_bytes if function is analyze_batch else get_segments_table_bytes
+    content = await run_in_threadpool(get_table_bytes, result, output_format)
+    return Response(content=content, media_type=SEGMENTS_TABLE_MEDIA_TYPES[output_format], headers=headers)
 
 
 @app.get("/error")
@@ -47,19 +97,60 @@ async def error():
 
 @app.post("/")
 @catch_exceptions
-async def run(file: UploadFile = File(...), fast: bool = Form(False), extraction_format: str = Form("")):
+async def run(
+    file: UploadFile = File(...),
+    fast: bool = Form(False),
+    extraction_format: str = Form(""),
+    profile: bool = Form(False),
+    ocr: bool = Form(False),
+    language: str = Form("en"),
+    output_format: str = Form("json"),
+    output: str = Form("segments"),
+    quantized: bool = Form(VGT_QUANTIZED),
+    mode: str = Form(""),
+):
+    if output == "tokens":
+        return await run_analysis(profile, analyze_pdf_tokens, file.file.read(), ocr, language)
+    analysis_arguments = (file.file.read(), "", extraction_format, False, ocr, language)
+    if mode == "auto":
+        return await run_analysis(profile, analyze_pdf_auto, *analysis_arguments, quantized, output_format=output_format)
     if fast:
-        return await run_in_threadpool(analyze_pdf_fast, file.file.read(), "", extraction_format)
-    return await run_in_threadpool(analyze_pdf, file.file.read(), "", extraction_format)
+        return await run_analysis(profile, analyze_pdf_fast, *analysis_arguments, output_format=output_format)
+    return await run_analysis(profile, analyze_pdf, *analysis_arguments, quantized, output_format=output_format)
+
+
+@app.post("/batch")
+@catch_exceptions
+async def run_batch(
+    files: list[UploadFile] = File(...),
+    fast: bool = Form(False),
+    extraction_format: str = Form(""),
+    profile: bool = Form(False),
+    ocr: bool = Form(False),
+    language: str = Form("en"),
+    output_format: str = Form("json"),
+    quantized: bool = Form(VGT_QUANTIZED),
+    mode: str = Form(""),
+):
+    uploads = [(file.filename, file.file.read()) for file in files]
+    analysis_arguments = (uploads, fast, extraction_format, ocr, language, quantized, mode)
+    return await run_analysis(profile, analyze_batch, *analysis_arguments, output_format=output_format)
 
 
 @app.post("/save_xml/{xml_file_name}")
 @catch_exceptions
-async def analyze_and_save_xml(file: UploadFile = File(...), xml_file_name: str | None = None, fast: bool = Form(False)):
+async def analyze_and_save_xml(
+    file: UploadFile = File(...),
+    xml_file_name: str | None = None,
+    fast: bool = Form(False),
+    profile: bool = Form(False),
+    ocr: bool = Form(False),
+    language: str = Form("en"),
+):
     xml_file_name = xml_file_name if xml_file_name.endswith(".xml") else f"{xml_file_name}.xml"
     if fast:
-        return await run_in_threadpool(analyze_pdf_fast, file.file.read(), xml_file_name, "")
-    return await run_in_threadpool(analyze_pdf, file.file.read(), xml_file_name, "")
+        return await run_analysis(profile, analyze_pdf_fast, file.file.read(), xml_file_name, "", False, ocr, language)
+    return await run_analysis(profile, analyze_pdf, file.file.read(), xml_file_name, "", False, ocr, language)
 
 
 @app.get("/get_xml/{xml_file_name}", response_class=PlainTextResponse)
@@ -71,8 +162,8 @@ async def get_xml_by_name(xml_file_name: str):
 
 @app.post("/toc")
 @catch_exceptions
-async def get_toc_endpoint(file: UploadFile = File(...), fast: bool = Form(False)):
-    return await run_in_threadpool(get_toc, file, fast)
+async def get_toc_endpoint(file: UploadFile = File(...), fast: bool = Form(False), profile: bool = Form(False)):
+    return await run_analysis(profile, get_toc, file, fast)
 
 
 @app.post("/toc_legacy_uwazi_compatible")
@@ -93,8 +184,15 @@ async def toc_legacy_uwazi_compatible(file: UploadFile = File(...)):
 
 @app.post("/text")
 @catch_exceptions
-async def get_text_endpoint(file: UploadFile = File(...), fast: bool = Form(False), types: str = Form("all")):
-    return await run_in_threadpool(get_text_extraction, file, fast, types)
+async def get_text_endpoint(
+    file: UploadFile = File(...),
+    fast: bool = Form(False),
+    types: str = Form("all"),
+    profile: bool = Form(False),
+    ocr: bool = Form(False),
+    language: str = Form("en"),
+):
+    return await run_analysis(profile, get_text_extraction, file, fast, types, ocr, language)
 
 
 @app.post("/visualize")
@@ -106,9 +204,16 @@ async def get_visualization_endpoint(file: UploadFile = File(...), fast: bool =
 @app.post("/ocr")
 @catch_exceptions
 async def ocr_pdf_sync(file: UploadFile = File(...), language: str = Form("en")):
-    namespace = "sync_pdfs"
-    path = Path(OCR_SOURCE, namespace, file.filename)
-    os.makedirs(path.parent, exist_ok=True)
-    path.write_bytes(file.file.read())
-    processed_pdf_filepath = ocr_pdf(file.filename, namespace, language)
-    return FileResponse(path=processed_pdf_filepath, media_type="application/pdf")
+    temporary_directory = Path(tempfile.mkdtemp())
+    source_pdf_filepath = Path(temporary_directory, "source.pdf")
+    processed_pdf_filepath = Path(temporary_directory, "processed.pdf")
+    source_pdf_filepath.write_bytes(file.file.read())
+    if not await run_in_ocr_pool(ocr_pdf_path, source_pdf_filepath, processed_pdf_filepath, language):
+        shutil.rmtree(temporary_directory, ignore_errors=True)
+        raise RuntimeError(f"OCR failed for language {language}")
+    return FileResponse(
+        path=processed_pdf_filepath,
+        media_type="application/pdf",
+        filename=Path(file.filename or "document.pdf").name,
+        background=BackgroundTask(shutil.rmtree, temporary_directory, ignore_errors=True),
+    )
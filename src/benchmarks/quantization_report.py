@@ -0,0 +1,65 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+from time import perf_counter
+
+from ..configuration import service_logger
+from .run_benchmarks import TEST_PDFS_PATH, disable_results_caches
+from .segments_comparison import compare_segments
+
+
+def analyze_timed(content: bytes, quantized: bool) -> tuple[list[dict], float]:
+    from ..pdf_layout_analysis.run_pdf_layout_analysis import analyze_pdf
+
+    start = perf_counter()
+    segments = analyze_pdf(content, "", quantized=quantized)
+    return segments, round(perf_counter() - start, 4)
+
+
+def print_report(rows: list[dict]):
+    print(f"{'document':<34}{'fp32 s':>9}{'int8 s':>9}{'recall':>9}{'precision':>11}{'types':>9}{'iou':>9}")
+    for row in rows:
+        print(
+            f"{row['document'][:33]:<34}{row['fp32_seconds']:>9}{row['int8_seconds']:>9}{row['recall']:>9}"
+            f"{row['precision']:>11}{row['type_agreement']:>9}{row['mean_iou']:>9}"
+        )
+
+
+def run_quantization_report(arguments: argparse.Namespace) -> int:
+    from ..pdf_layout_analysis.run_pdf_layout_analysis import use_quantized_model
+
+    if not use_quantized_model(True):
+        service_logger.error("The quantized VGT model only runs on CPU")
+        return 1
+
+    disable_results_caches()
+    pdf_paths = sorted(Path(arguments.pdfs).glob("*.pdf"))
+    if pdf_paths:
+        service_logger.info("Loading both models before measuring")
+        analyze_timed(pdf_paths[0].read_bytes(), False)
+        analyze_timed(pdf_paths[0].read_bytes(), True)
+
+    rows = []
+    for pdf_path in pdf_paths:
+        service_logger.info(f"Comparing FP32 and INT8 VGT on {pdf_path.name}")
+        content = pdf_path.read_bytes()
+        fp32_segments, fp32_seconds = analyze_timed(content, False)
+        int8_segments, int8_seconds = analyze_timed(content, True)
+        comparison = compare_segments(fp32_segments, int8_segments)
+        rows.append({"document": pdf_path.name, "fp32_seconds": fp32_seconds, "int8_seconds": int8_seconds, **comparison})
+
+    print_report(rows)
+    Path(arguments.output).write_text(json.dumps({"python": sys.version, "results": rows}, indent=2))
+    return 0
+
+
+def get_arguments_parser():
+    parser = argparse.ArgumentParser(description="Accuracy and speed of the INT8 quantized VGT model against FP32")
+    parser.add_argument("--pdfs", default=str(TEST_PDFS_PATH), help="Folder with the PDFs to compare")
+    parser.add_argument("--output", default="quantization_report.json")
+    return parser
+
+
+if __name__ == "__main__":
+    sys.exit(run_quantization_report(get_arguments_parser().parse_args()))
@@ -0,0 +1,69 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from ..configuration import service_logger
+from ..vgt.adaptive_resolution import RESOLUTION_POLICY
+from .quantization_report import analyze_timed
+from .run_benchmarks import TEST_PDFS_PATH, disable_results_caches
+from .segments_comparison import compare_segments
+
+
+def analyze_with_policy(content: bytes, enabled: bool) -> tuple[list[dict], float]:
+    RESOLUTION_POLICY["enabled"] = enabled
+    return analyze_timed(content, False)
+
+
+def print_report(rows: list[dict]):
+    print(f"{'document':<34}{'fixed s':>9}{'adaptive s':>12}{'recall':>9}{'precision':>11}{'types':>9}{'iou':>9}")
+    for row in rows:
+        print(
+            f"{row['document'][:33]:<34}{row['fixed_seconds']:>9}{row['adaptive_seconds']:>12}{row['recall']:>9}"
+            f"{row['precision']:>11}{row['type_agreement']:>9}{row['mean_iou']:>9}"
+        )
+
+
+def run_resolution_report(arguments: argparse.Namespace) -> int:
+    """Adaptive resolution against the fixed test size, with the policy thresholds given in the arguments"""
+    RESOLUTION_POLICY.update(
+        sparse_tokens=arguments.sparse_tokens,
+        sparse_ink=arguments.sparse_ink,
+        sparse_content=arguments.sparse_content,
+        sparse_min_size=arguments.sparse_min_size,
+    )
+    disable_results_caches()
+    pdf_paths = sorted(Path(arguments.pdfs).glob("*.pdf"))
+    if pdf_paths:
+        analyze_with_policy(pdf_paths[0].read_bytes(), False)
+
+    rows = []
+    for pdf_path in pdf_paths:
+        service_logger.info(f"Comparing fixed and adaptive VGT resolution on {pdf_path.name}")
+        content = pdf_path.read_bytes()
+        fixed_segments, fixed_seconds = analyze_with_policy(content, False)
+        adaptive_segments, adaptive_seconds = analyze_with_policy(content, True)
+        comparison = compare_segments(fixed_segments, adaptive_segments)
+        rows.append(
+            {"document": pdf_path.name, "fixed_seconds": fixed_seconds, "adaptive_seconds": adaptive_seconds, **comparison}
+        )
+
+    print_report(rows)
+    output = {"policy": {**RESOLUTION_POLICY, "enabled": True}, "results": rows}
+    Path(arguments.output).write_text(json.dumps(output, indent=2))
+    return 0
+
+
+def get_arguments_parser():
+    parser = argparse.ArgumentParser(description="Accuracy and speed of the adaptive VGT input resolution")
+    parser.add_argument("--pdfs", default=str(TEST_PDFS_PATH), help="Folder with the PDFs to compare")
+    parser.add_argument("--sparse-tokens", type=int, default=RESOLUTION_POLICY["sparse_tokens"])
+    parser.add_argument("--sparse-ink", type=float, default=RESOLUTION_POLICY["sparse_ink"])
+    parser.add_argument("--sparse-content", type=float, default=RESOLUTION_POLICY["sparse_content"])
+    parser.add_argument("--sparse-min-size", type=int, default=RESOLUTION_POLICY["sparse_min_size"])
+    parser.add_argument("--output", default="resolution_report.json")
+    return parser
+
+
+if __name__ == "__main__":
+    sys.exit(run_resolution_report(get_arguments_parser().parse_args()))
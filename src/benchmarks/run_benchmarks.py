@@ -0,0 +1,318 @@
+import argparse
+import json
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+from ..configuration import SRC_PATH, service_logger
+from ..metrics.RequestProfile import RequestProfile, ACTIVE_PROFILE
+
+TEST_PDFS_PATH = Path(SRC_PATH.parent, "test_pdfs")
+BASELINE_PATH = Path(SRC_PATH, "benchmarks", "baseline.json")
+DOCUMENT_CASES = ["features", "fast", "vgt", "toc"]
+ALL_CASES = DOCUMENT_CASES + ["synthetic", "attention", "imports"]
+IMPORT_MODULES = ["src.app", "src.pdf_layout_analysis.run_pdf_layout_analysis_fast"]
+DEFERRED_MODULES = ["torch", "detectron2", "transformers", "timm", "struct_eqtable", "rapid_latex_ocr"]
+DEFERRED_IMPORT_ERROR = "Imported at startup:"
+
+
+def get_peak_rss_mb() -> float:
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak_rss / 1024 ** (2 if sys.platform == "darwin" else 1), 2)
+
+
+def measure(case: str, document: str, function, *args) -> dict:
+    request_profile = RequestProfile()
+    token = ACTIVE_PROFILE.set(request_profile)
+    start = perf_counter()
+    try:
+        result = function(*args)
+        error = ""
+    except Exception as exception:
+        result = None
+        error = f"{type(exception).__name__}: {exception}"
+    finally:
+        seconds = perf_counter() - start
+        ACTIVE_PROFILE.reset(token)
+
+    if result is not None and hasattr(result, "pages"):
+        request_profile.add_document(len(result.pages), sum(len(page.tokens) for page in result.pages))
+
+    return {
+        "case": case,
+        "document": document,
+        "seconds": round(seconds, 4),
+        "pages": request_profile.pages,
+        "tokens": request_profile.tokens,
+        "pages_per_second": round(request_profile.pages / seconds, 3) if seconds else 0,
+        "tokens_per_second": round(request_profile.tokens / seconds, 3) if seconds else 0,
+        "peak_rss_mb": get_peak_rss_mb(),
+        "stages": request_profile.to_dict()["stages"],
+        "error": error,
+    }
+
+
+def load_vgt_weights(vgt_weights: str):
+    if vgt_weights == "default":
+        return
+
+    from detectron2.checkpoint import DetectionCheckpointer
+    from ..ditod.VGTTrainer import VGTTrainer
+    from ..pdf_layout_analysis import run_pdf_layout_analysis
+    from ..vgt.get_model_configuration import get_model_configuration
+
+    configuration = get_model_configuration()
+    model = VGTTrainer.build_model(configuration)
+    if vgt_weights == "stub":
+        service_logger.info("Benchmarking VGT with randomly initialized weights")
+        model.Wordgrid_embedding.weights_loaded = True
+    else:
+        DetectionCheckpointer(model).load(vgt_weights)
+    run_pdf_layout_analysis._model, run_pdf_layout_analysis._configuration = model, configuration
+
+
+def benchmark_document(case: str, pdf_path: Path) -> dict:
+    content = pdf_path.read_bytes()
+
+    if case == "features":
+        from ..pdf_features.PdfFeatures import PdfFeatures
+
+        with tempfile.TemporaryDirectory() as temporary_directory:
+            temporary_pdf_path = Path(shutil.copy(pdf_path, temporary_directory))
+            return measure(case, pdf_path.name, PdfFeatures.from_pdf_path, str(temporary_pdf_path))
+
+    if case == "fast":
+        from ..pdf_layout_analysis.run_pdf_layout_analysis_fast import analyze_pdf_fast
+
+        return measure(case, pdf_path.name, analyze_pdf_fast, content)
+
+    if case == "vgt":
+        from ..pdf_layout_analysis.run_pdf_layout_analysis import analyze_pdf
+
+        return measure(case, pdf_path.name, analyze_pdf, content, "")
+
+    from ..pdf_layout_analysis.run_pdf_layout_analysis_fast import analyze_pdf_fast
+    from ..toc.extract_table_of_contents import extract_table_of_contents
+
+    segment_boxes = analyze_pdf_fast(content)
+    return measure(case, pdf_path.name, extract_table_of_contents, content, segment_boxes)
+
+
+def benchmark_synthetic(pages_count: int, tokens_per_page: int) -> list[dict]:
+    from ..pdf_tokens_type_trainer.ModelConfiguration import ModelConfiguration
+    from ..pdf_tokens_type_trainer.TokenTypeTrainer import TokenTypeTrainer
+    from ..vgt.get_most_probable_pdf_segments import merge_colliding_predictions
+    from ..vgt.get_reading_orders import get_ordered_segments_for_page
+    from .synthetic_documents import get_synthetic_pdf_features, get_synthetic_segments, get_synthetic_predictions
+
+    document = f"synthetic_{pages_count}x{tokens_per_page}"
+    service_logger.info(f"Generating {document}")
+    synthetic_pdf_features = []
+
+    def get_pdf_features():
+        synthetic_pdf_features.append(get_synthetic_pdf_features(pages_count, tokens_per_page))
+        return synthetic_pdf_features[0]
+
+    features_result = measure("synthetic_features", document, get_pdf_features)
+    if features_result["error"]:
+        return [features_result]
+
+    pdf_features = synthetic_pdf_features[0]
+    segments_by_page = {page.page_number: [] for page in pdf_features.pages}
+    for segment in get_synthetic_segments(pdf_features):
+        segments_by_page[segment.page_number].append(segment)
+
+    def get_model_input():
+        return TokenTypeTrainer([pdf_features], ModelConfiguration()).get_model_input()
+
+    def get_reading_orders():
+        for page in pdf_features.pages:
+            get_ordered_segments_for_page(segments_by_page[page.page_number], page)
+
+    def merge_predictions():
+        for page in pdf_features.pages:
+            merge_colliding_predictions(get_synthetic_predictions(segments_by_page[page.page_number]))
+
+    results = [features_result]
+    for case, function in [
+        ("synthetic_model_input", get_model_input),
+        ("synthetic_reading_order", get_reading_orders),
+        ("synthetic_merge_predictions", merge_predictions),
+    ]:
+        result = measure(case, document, function)
+        result["pages"], result["tokens"] = features_result["pages"], features_result["tokens"]
+        result["pages_per_second"] = round(result["pages"] / result["seconds"], 3) if result["seconds"] else 0
+        result["tokens_per_second"] = round(result["tokens"] / result["seconds"], 3) if result["seconds"] else 0
+        results.append(result)
+    return results
+
+
+def benchmark_attention(window_size: tuple[int, int]) -> list[dict]:
+    """Times the VGT attention modules with the fused kernels and with the math path"""
+    import torch
+    from ..ditod import VGTbeit
+
+    torch.manual_seed(0)
+    tokens_count = window_size[0] * window_size[1] + 1
+    document = f"{tokens_count}_tokens"
+    attention = VGTbeit.Attention(768, num_heads=12, qkv_bias=True, window_size=(14, 14)).eval()
+    cross_attention = VGTbeit.CrossAttention(768, num_heads=12, qkv_bias=True).eval()
+    for module in [attention, cross_attention]:
+        for parameter in module.parameters():
+            torch.nn.init.normal_(parameter, std=0.02)
+    x = torch.randn(1, tokens_count, 768)
+    y = torch.randn(1, tokens_count, 768)
+    training_window_size = torch.tensor(window_size)
+
+    results = []
+    fused_attention = VGTbeit.USE_FUSED_ATTENTION
+    for case, function in [
+        ("attention", lambda: attention(x, training_window_size=training_window_size)),
+        ("cross_attention", lambda: cross_attention(x, y)),
+    ]:
+        for fused in [False, True]:
+            VGTbeit.USE_FUSED_ATTENTION = fused
+            with torch.no_grad():
+                results.append(measure(f"{case}_{'fused' if fused else 'math'}", document, function))
+        VGTbeit.USE_FUSED_ATTENTION = fused_attention
+    return results
+
+
+def get_import_times(module: str) -> dict[str, int]:
+    """Cumulative microseconds of every module imported by the module, from python -X importtime"""
+    command = [sys.executable, "-X", "importtime", "-c", f"import {module}"]
+    process = subprocess.run(command, cwd=SRC_PATH.parent, capture_output=True, text=True, check=True)
+    import_times = {}
+    for line in process.stderr.splitlines():
+        if line.startswith("import time:") and not line.endswith("imported package"):
+            _, cumulative, imported_module = line.split("|")
+            import_times[imported_module.strip()] = int(cumulative)
+    return import_times
+
+
+def benchmark_imports(module: str) -> dict:
+    """Startup import time of the module, failing if it imports the packages that are only needed by VGT"""
+    import_times = {}
+    result = measure("imports", module, lambda: import_times.update(get_import_times(module)))
+    result["seconds"] = round(import_times.get(module, 0) / 1e6, 4)
+    packages = {name: microseconds for name, microseconds in import_times.items() if "." not in name}
+    result["slowest_packages"] = dict(sorted(packages.items(), key=lambda item: -item[1])[:10])
+    deferred_modules = [deferred_module for deferred_module in DEFERRED_MODULES if deferred_module in import_times]
+    if deferred_modules:
+        result["error"] = f"{DEFERRED_IMPORT_ERROR} {', '.join(deferred_modules)}"
+    return result
+
+
+def compare_with_baseline(results: list[dict], baseline: dict, threshold: float) -> list[str]:
+    baseline_seconds = {(result["case"], result["document"]): result["seconds"] for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        key = (result["case"], result["document"])
+        if key not in baseline_seconds or not baseline_seconds[key]:
+            continue
+        if result["error"]:
+            regressions.append(f"{key[0]} {key[1]}: {baseline_seconds[key]}s -> error ({result['error']})")
+            continue
+        ratio = result["seconds"] / baseline_seconds[key]
+        if ratio > 1 + threshold:
+            regressions.append(f"{key[0]} {key[1]}: {baseline_seconds[key]}s -> {result['seconds']}s ({ratio:.2f}x)")
+    return regressions
+
+
+def print_results(results: list[dict]):
+    print(f"{'case':<28}{'document':<34}{'seconds':>10}{'pages/s':>10}{'tokens/s':>12}{'rss MB':>10}")
+    for result in results:
+        seconds = result["seconds"] if not result["error"] else "error"
+        print(
+            f"{result['case']:<28}{result['document'][:33]:<34}{seconds:>10}{result['pages_per_second']:>10}"
+            f"{result['tokens_per_second']:>12}{result['peak_rss_mb']:>10}"
+        )
+
+
+def disable_results_caches():
+    """Repeated runs on the same documents would otherwise measure cache hits"""
+    from ..cache.page_results_cache import PAGE_RESULTS_CACHE
+    from ..cache.vgt_predictions_cache import VGT_PREDICTIONS_CACHE
+
+    PAGE_RESULTS_CACHE.max_bytes = 0
+    VGT_PREDICTIONS_CACHE.max_bytes = 0
+
+
+def run_benchmarks(arguments: argparse.Namespace) -> int:
+    cases = [case.strip() for case in arguments.cases.split(",")]
+    disable_results_caches()
+    pdf_paths = sorted(Path(arguments.pdfs).glob("*.pdf"))
+    if arguments.documents:
+        pdf_paths = [path for path in pdf_paths if path.name in arguments.documents.split(",")]
+
+    if "vgt" in cases:
+        load_vgt_weights(arguments.vgt_weights)
+
+    results = []
+    for case in [case for case in cases if case in DOCUMENT_CASES]:
+        if arguments.warmup and pdf_paths:
+            benchmark_document(case, pdf_paths[0])
+        for pdf_path in pdf_paths:
+            service_logger.info(f"Benchmarking {case} on {pdf_path.name}")
+            repetitions = [benchmark_document(case, pdf_path) for _ in range(arguments.repeat)]
+            results.append(min(repetitions, key=lambda result: result["seconds"]))
+
+    if "synthetic" in cases:
+        results.extend(benchmark_synthetic(arguments.synthetic_pages, arguments.synthetic_tokens_per_page))
+
+    if "attention" in cases:
+        results.extend(benchmark_attention(tuple(int(size) for size in arguments.attention_window.split(","))))
+
+    if "imports" in cases:
+        results.extend(benchmark_imports(module) for module in IMPORT_MODULES)
+
+    print_results(results)
+    output = {"python": sys.version, "platform": platform.platform(), "results": results}
+    Path(arguments.output).write_text(json.dumps(output, indent=2))
+
+    import_errors = [result for result in results if result["error"].startswith(DEFERRED_IMPORT_ERROR)]
+    for result in import_errors:
+        service_logger.error(f"Imports: {result['document']}: {result['error']}")
+    if import_errors:
+        return 1
+
+    if arguments.update_baseline:
+        Path(arguments.baseline).write_text(json.dumps(output, indent=2))
+        service_logger.info(f"Baseline updated: {arguments.baseline}")
+        return 0
+
+    if not Path(arguments.baseline).exists():
+        service_logger.info(f"No baseline found in {arguments.baseline}, skipping regression check")
+        return 0
+
+    regressions = compare_with_baseline(results, json.loads(Path(arguments.baseline).read_text()), arguments.threshold)
+    for regression in regressions:
+        service_logger.error(f"Regression: {regression}")
+    return 1 if regressions else 0
+
+
+def get_arguments_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the PDF layout analysis pipeline on CPU")
+    parser.add_argument("--cases", default="features,fast,toc", help=f"Comma separated cases from {ALL_CASES}")
+    parser.add_argument("--pdfs", default=str(TEST_PDFS_PATH), help="Folder with the PDFs to benchmark")
+    parser.add_argument("--documents", default="", help="Comma separated PDF names to benchmark, all by default")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per document, the fastest one is kept")
+    parser.add_argument("--warmup", action="store_true", help="Run each case once before measuring to load models")
+    parser.add_argument("--vgt-weights", default="default", help="'default', 'stub' (random weights) or a .pth path")
+    parser.add_argument("--synthetic-pages", type=int, default=1000)
+    parser.add_argument("--synthetic-tokens-per-page", type=int, default=10000)
+    parser.add_argument("--attention-window", default="48,36", help="Patches height,width of the attention case")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown against the baseline, 0.2 = 20%%")
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the new baseline")
+    return parser
+
+
+if __name__ == "__main__":
+    sys.exit(run_benchmarks(get_arguments_parser().parse_args()))
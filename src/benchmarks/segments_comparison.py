@@ -0,0 +1,41 @@
+MATCH_IOU = 0.5
+
+
+def get_iou(segment: dict, other_segment: dict) -> float:
+    left = max(segment["left"], other_segment["left"])
+    top = max(segment["top"], other_segment["top"])
+    right = min(segment["left"] + segment["width"], other_segment["left"] + other_segment["width"])
+    bottom = min(segment["top"] + segment["height"], other_segment["top"] + other_segment["height"])
+    if right <= left or bottom <= top:
+        return 0
+    intersection = (right - left) * (bottom - top)
+    union = segment["width"] * segment["height"] + other_segment["width"] * other_segment["height"] - intersection
+    return intersection / union if union else 0
+
+
+def compare_segments(reference: list[dict], candidate: list[dict]) -> dict:
+    """Greedy matching of the segments of each page by IoU against the reference segments"""
+    matched, same_type, ious = 0, 0, []
+    for page_number in sorted({segment["page_number"] for segment in reference}):
+        unmatched = [segment for segment in candidate if segment["page_number"] == page_number]
+        for segment in [segment for segment in reference if segment["page_number"] == page_number]:
+            if not unmatched:
+                break
+            best_match = max(unmatched, key=lambda other_segment: get_iou(segment, other_segment))
+            iou = get_iou(segment, best_match)
+            if iou < MATCH_IOU:
+                continue
+            unmatched.remove(best_match)
+            matched += 1
+            same_type += segment["type"] == best_match["type"]
+            ious.append(iou)
+
+    return {
+        "reference_segments": len(reference),
+        "candidate_segments": len(candidate),
+        "matched": matched,
+        "recall": round(matched / len(reference), 4) if reference else 1,
+        "precision": round(matched / len(candidate), 4) if candidate else 1,
+        "type_agreement": round(same_type / matched, 4) if matched else 1,
+        "mean_iou": round(sum(ious) / len(ious), 4) if ious else 1,
+    }
@@ -0,0 +1,77 @@
+import random
+import string
+
+from ..data_model.Prediction import Prediction
+from ..fast_trainer.PdfSegment import PdfSegment
+from ..pdf_features.PdfFeatures import PdfFeatures
+from ..pdf_features.Rectangle import Rectangle
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+MARGIN = 36
+TOKEN_HEIGHT = 6
+TOKENS_PER_LINE = 8
+
+
+def get_random_word(random_generator: random.Random):
+    return "".join(random_generator.choices(string.ascii_lowercase, k=random_generator.randint(2, 9)))
+
+
+def get_page_xml(page_number: int, tokens_per_page: int, random_generator: random.Random):
+    lines_count = max(1, tokens_per_page // TOKENS_PER_LINE)
+    line_height = max(1, (PAGE_HEIGHT - 2 * MARGIN) // lines_count)
+    token_width = (PAGE_WIDTH - 2 * MARGIN) // TOKENS_PER_LINE
+    texts = []
+    for index in range(tokens_per_page):
+        line, column = divmod(index, TOKENS_PER_LINE)
+        top = MARGIN + (line % lines_count) * line_height
+        left = MARGIN + column * token_width
+        font = "1" if column == 0 and line % 20 == 0 else "0"
+        content = get_random_word(random_generator) + " " + get_random_word(random_generator)
+        texts.append(
+            f'<text top="{top}" left="{left}" width="{token_width - 4}" height="{TOKEN_HEIGHT}" font="{font}">{content}</text>'
+        )
+
+    page_attributes = (
+        f'number="{page_number}" position="absolute" top="0" left="0" height="{PAGE_HEIGHT}" width="{PAGE_WIDTH}"'
+    )
+    return f"<page {page_attributes}>" + "".join(texts) + "</page>"
+
+
+def get_synthetic_xml(pages_count: int, tokens_per_page: int, seed: int = 22) -> str:
+    random_generator = random.Random(seed)
+    fonts = [
+        '<fontspec id="0" size="10" family="Times" color="#000000"/>',
+        '<fontspec id="1" size="14" family="Times-Bold" color="#000000"/>',
+    ]
+    pages = [get_page_xml(page_number, tokens_per_page, random_generator) for page_number in range(1, pages_count + 1)]
+    return '<?xml version="1.0" encoding="UTF-8"?><pdf2xml>' + "".join(fonts) + "".join(pages) + "</pdf2xml>"
+
+
+def get_synthetic_pdf_features(pages_count: int, tokens_per_page: int) -> PdfFeatures:
+    xml_content = get_synthetic_xml(pages_count, tokens_per_page)
+    return PdfFeatures.from_poppler_etree_content("synthetic/synthetic.xml", xml_content, "synthetic")
+
+
+def get_synthetic_segments(pdf_features: PdfFeatures, tokens_per_segment: int = 40) -> list[PdfSegment]:
+    segments = []
+    for page in pdf_features.pages:
+        for index in range(0, len(page.tokens), tokens_per_segment):
+            segments.append(PdfSegment.from_pdf_tokens(page.tokens[index : index + tokens_per_segment], "synthetic"))
+    return segments
+
+
+def get_synthetic_predictions(pdf_segments: list[PdfSegment]) -> list[Prediction]:
+    random_generator = random.Random(22)
+    predictions = []
+    for segment in pdf_segments:
+        for _ in range(3):
+            shift = random_generator.randint(-3, 3)
+            bounding_box = Rectangle.from_width_height(
+                segment.bounding_box.left + shift,
+                segment.bounding_box.top + shift,
+                segment.bounding_box.width,
+                segment.bounding_box.height,
+            )
+            predictions.append(Prediction(bounding_box, 10, random_generator.uniform(20, 100)))
+    return predictions
@@ -0,0 +1,203 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from time import perf_counter
+
+from .configuration import service_logger
+from .pdf_layout_analysis.preload_models import set_worker_threads
+from .pdf_layout_analysis.run_pdf_layout_analysis import analyze_pdfs
+from .pdf_layout_analysis.run_pdf_layout_analysis_fast import analyze_pdfs_fast
+from .toc.extract_table_of_contents import extract_table_of_contents
+
+ANALYSES = ["fast", "vgt", "toc_fast", "toc"]
+
+
+def get_input_paths(input_path: Path) -> list[Path]:
+    """PDFs under a folder, or the paths listed one per line in a manifest file (relative to the manifest folder)"""
+    if input_path.is_dir():
+        return sorted(path for path in input_path.rglob("*") if path.suffix.lower() == ".pdf")
+    lines = [line.strip() for line in input_path.read_text().splitlines()]
+    return [Path(input_path.parent, line) for line in lines if line and not line.startswith("#")]
+
+
+def get_batches(paths: list[Path], batch_size: int) -> list[list[Path]]:
+    return [paths[index : index + batch_size] for index in range(0, len(paths), batch_size)]
+
+
+def analyze_contents(contents: list[bytes], analysis: str, extraction_format: str, ocr: bool, language: str) -> list:
+    fast = analysis in ["fast", "toc_fast"]
+    analyze = analyze_pdfs_fast if fast else analyze_pdfs
+    results = analyze(contents, extraction_format, ocr, language)
+    if analysis.startswith("toc"):
+        return [extract_table_of_contents(content, segments) for content, segments in zip(contents, results)]
+    return results
+
+
+def get_row(path: Path, result, error: str, seconds: float) -> dict:
+    return {
+        "path": str(path),
+        "status": "error" if error else "ok",
+        "error": error,
+        "seconds": round(seconds, 3),
+        "result": result,
+    }
+
+
+def process_batch(paths: list[Path], analysis: str, extraction_format: str, ocr: bool, language: str) -> list[dict]:
+    """Analyzes the batch together, or document by document if it fails to isolate the failing PDFs"""
+    start = perf_counter()
+    contents = [path.read_bytes() for path in paths]
+    try:
+        results = analyze_contents(contents, analysis, extraction_format, ocr, language)
+        seconds = (perf_counter() - start) / len(paths)
+        return [get_row(path, result, "", seconds) for path, result in zip(paths, results)]
+    except Exception as exception:
+        if len(paths) == 1:
+            return [get_row(paths[0], None, f"{type(exception).__name__}: {exception}", perf_counter() - start)]
+
+    rows = []
+    for path in paths:
+        rows.extend(process_batch([path], analysis, extraction_format, ocr, language))
+    return rows
+
+
+class JsonlWriter:
+    def __init__(self, output_path: Path):
+        self.output_path = output_path
+
+    def get_done_rows(self) -> list[dict]:
+        if not self.output_path.exists():
+            return []
+        content = self.output_path.read_bytes()
+        complete_content = content[: content.rfind(b"\n") + 1]
+        if len(complete_content) < len(content):
+            service_logger.info(f"Dropping an incomplete last line of {self.output_path}")
+            with open(self.output_path, "r+b") as file:
+                file.truncate(len(complete_content))
+        return [json.loads(line) for line in complete_content.splitlines() if line.strip()]
+
+    def remove_paths(self, paths: set[str]):
+        lines = self.output_path.read_text().splitlines(keepends=True)
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.output_path.parent)
+        with os.fdopen(file_descriptor, "w") as file:
+            file.writelines(line for line in lines if line.strip() and json.loads(line)["path"] not in paths)
+        os.replace(temporary_path, self.output_path)
+
+    def write(self, rows: list[dict]):
+        with open(self.output_path, "a") as file:
+            for row in rows:
+                file.write(json.dumps(row) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+
+class ParquetWriter:
+    """Writes each batch as a part file of the output folder, the result is stored as a JSON string column"""
+
+    def __init__(self, output_path: Path):
+        import pyarrow
+        import pyarrow.parquet
+
+        self.pyarrow = pyarrow
+        self.parquet = pyarrow.parquet
+        self.output_path = output_path
+        os.makedirs(output_path, exist_ok=True)
+
+    def get_done_rows(self) -> list[dict]:
+        rows = []
+        for part_path in sorted(self.output_path.glob("part-*.parquet")):
+            rows.extend(self.parquet.read_table(part_path, columns=["path", "status"]).to_pylist())
+        return rows
+
+    def remove_paths(self, paths: set[str]):
+        """Part files are rewritten without the rows, not deleted, to keep the part numbers"""
+        for part_path in sorted(self.output_path.glob("part-*.parquet")):
+            table = self.parquet.read_table(part_path)
+            keep = [path not in paths for path in table.column("path").to_pylist()]
+            if all(keep):
+                continue
+            temporary_path = part_path.with_suffix(".tmp")
+            self.parquet.write_table(table.filter(self.pyarrow.array(keep)), temporary_path)
+            os.replace(temporary_path, part_path)
+
+    def write(self, rows: list[dict]):
+        parts_count = len(list(self.output_path.glob("part-*.parquet")))
+        part_path = Path(self.output_path, f"part-{parts_count:06d}.parquet")
+        table = self.pyarrow.Table.from_pylist([{**row, "result": json.dumps(row["result"])} for row in rows])
+        temporary_path = part_path.with_suffix(".tmp")
+        self.parquet.write_table(table, temporary_path)
+        os.replace(temporary_path, part_path)
+
+
+def get_writer(output_path: Path) -> JsonlWriter | ParquetWriter:
+    return ParquetWriter(output_path) if output_path.suffix == ".parquet" else JsonlWriter(output_path)
+
+
+def report_progress(done: int, total: int, done_bytes: int, errors: int, start: float):
+    seconds = perf_counter() - start
+    service_logger.info(
+        f"{done}/{total} PDFs, {errors} errors, {done / seconds:.2f} PDFs/s, {done_bytes / seconds / 1024 / 1024:.2f} MB/s"
+    )
+
+
+def run_bulk(arguments: argparse.Namespace) -> int:
+    output_path = Path(arguments.output)
+    writer = get_writer(output_path)
+    done_rows = writer.get_done_rows()
+    done_paths = {row["path"] for row in done_rows if row["status"] == "ok" or not arguments.retry_errors}
+
+    paths = [path for path in get_input_paths(Path(arguments.input)) if str(path) not in done_paths]
+    retried_paths = {row["path"] for row in done_rows if row["status"] == "error"} & {str(path) for path in paths}
+    if retried_paths:
+        writer.remove_paths(retried_paths)
+    service_logger.info(f"{len(done_paths)} PDFs already in {output_path}, {len(paths)} to process")
+    batches = get_batches(paths, max(1, arguments.batch_size))
+    batch_arguments = (arguments.analysis, arguments.extraction_format, arguments.ocr, arguments.language)
+
+    done, done_bytes, errors = 0, 0, 0
+    start = perf_counter()
+
+    def write_batch(rows: list[dict]):
+        nonlocal done, done_bytes, errors
+        writer.write(rows)
+        done += len(rows)
+        done_bytes += sum(Path(row["path"]).stat().st_size for row in rows)
+        errors += sum(row["status"] == "error" for row in rows)
+        report_progress(done, len(paths), done_bytes, errors, start)
+
+    if arguments.workers < 2:
+        for batch in batches:
+            write_batch(process_batch(batch, *batch_arguments))
+    else:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=arguments.workers, mp_context=context, initializer=set_worker_threads, initargs=(arguments.workers,)
+        ) as executor:
+            futures = [executor.submit(process_batch, batch, *batch_arguments) for batch in batches]
+            for future in as_completed(futures):
+                write_batch(future.result())
+
+    return 1 if errors else 0
+
+
+def get_arguments_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Analyze a folder of PDFs offline, resuming interrupted runs")
+    parser.add_argument("input", help="Folder with PDFs (searched recursively) or a manifest file with a PDF path per line")
+    parser.add_argument("output", help="Results file: .jsonl, or .parquet for a folder of parquet parts")
+    parser.add_argument("--analysis", default="fast", choices=ANALYSES)
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes, each one loads its own models")
+    parser.add_argument("--batch-size", type=int, default=8, help="PDFs analyzed together in a worker")
+    parser.add_argument("--extraction-format", default="", help="markdown, latex or html for tables and formulas")
+    parser.add_argument("--ocr", action="store_true", help="OCR the pages without text before the analysis")
+    parser.add_argument("--language", default="en", help="OCR language")
+    parser.add_argument("--retry-errors", action="store_true", help="Process again the PDFs that failed in previous runs")
+    return parser
+
+
+if __name__ == "__main__":
+    sys.exit(run_bulk(get_arguments_parser().parse_args()))
@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+
+class DiskLRUCache:
+    def __init__(self, cache_path: str | Path, max_bytes: int, suffix: str = ""):
+        self.cache_path = Path(cache_path)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.lock = threading.Lock()
+        self.estimated_bytes: int | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get_path(self, key: str) -> Path:
+        return Path(self.cache_path, key[:2], key + self.suffix)
+
+    def get(self, key: str) -> bytes | None:
+        if not self.enabled:
+            return None
+        path = self.get_path(key)
+        try:
+            content = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return content
+
+    def copy_to(self, key: str, destination: str | Path) -> bool:
+        if not self.enabled:
+            return False
+        path = self.get_path(key)
+        try:
+            shutil.copyfile(path, destination)
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def put(self, key: str, content: bytes):
+        if not self.enabled or len(content) > self.max_bytes:
+            return
+        path = self.get_path(key)
+        os.makedirs(path.parent, exist_ok=True)
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=path.parent)
+        with os.fdopen(file_descriptor, "wb") as file:
+            file.write(content)
+        os.replace(temporary_path, path)
+        with self.lock:
+            self.estimated_bytes = None if self.estimated_bytes is None else self.estimated_bytes + len(content)
+            if self.estimated_bytes is None or self.estimated_bytes > self.max_bytes:
+                self.evict()
+
+    def get_entries(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        for path in self.cache_path.glob(f"*/*{self.suffix}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def put_file(self, key: str, source: str | Path):
+        self.put(key, Path(source).read_bytes())
+
+    def evict(self):
+        """Removes the least recently used entries until the cache fits in max_bytes. Called with the lock held"""
+        entries = self.get_entries()
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total_bytes -= size
+        self.estimated_bytes = total_bytes
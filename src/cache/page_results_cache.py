@@ -0,0 +1,124 @@
+import copy
+import hashlib
+import json
+from pathlib import Path
+from typing import Container
+
+from ..cache.DiskLRUCache import DiskLRUCache
+from ..configuration import MODELS_PATH, PAGE_CACHE_PATH, PAGE_CACHE_MAX_MB
+from ..data_model.PdfImages import PdfImages
+from ..fast_trainer.PdfSegment import PdfSegment
+from ..pdf_features.PdfPage import PdfPage
+from ..pdf_features.Rectangle import Rectangle
+from ..pdf_token_type_labels.TokenType import TokenType
+from ..vgt.adaptive_resolution import get_resolution_context
+
+PAGE_RESULTS_CACHE = DiskLRUCache(PAGE_CACHE_PATH, PAGE_CACHE_MAX_MB * 1024 * 1024, ".json")
+VGT_MODEL_FILES = ["doclaynet_VGT_model.pth"]
+FAST_MODEL_FILES = ["token_type_lightgbm.model", "paragraph_extraction_lightgbm.model"]
+
+
+def get_models_fingerprint(model_files: list[str]) -> str:
+    models_stats = []
+    for model_file in model_files:
+        model_path = Path(MODELS_PATH, model_file)
+        stat = model_path.stat() if model_path.exists() else None
+        models_stats.append(f"{model_file}:{stat.st_size}:{stat.st_mtime_ns}" if stat else model_file)
+    return ",".join(models_stats)
+
+
+def get_vgt_context(quantized: bool = False, precision: str = "fp32") -> str:
+    """The VGT predictions depend on the weights, the quantization, the precision and the input resolution policy"""
+    if quantized:
+        context = "vgt_int8|" + get_models_fingerprint(VGT_MODEL_FILES)
+    else:
+        context = ("vgt|" if precision == "fp32" else f"vgt_{precision}|") + get_models_fingerprint(VGT_MODEL_FILES)
+    return context + get_resolution_context()
+
+
+def get_fast_context(pdf_images: PdfImages) -> str:
+    """The LightGBM features depend on the document modes, pages are only reused while those stay the same"""
+    return "fast|" + get_models_fingerprint(FAST_MODEL_FILES) + "|" + pdf_images.pdf_features.pdf_modes.model_dump_json()
+
+
+def get_page_fingerprint(page: PdfPage, page_image, context: str) -> str:
+    """Hash of the page tokens as parsed by pdftohtml, the rendered page and the models context. Not of the page number"""
+    fingerprint = hashlib.sha256(context.encode())
+    fingerprint.update(f"{page.page_width}x{page.page_height}".encode())
+    for token in page.tokens:
+        box = token.bounding_box
+        font = token.font
+        token_key = (
+            f"{token.content}|{box.left},{box.top},{box.right},{box.bottom}|{font.font_size},{font.bold},{font.italics}"
+        )
+        fingerprint.update(token_key.encode())
+    fingerprint.update(page_image.tobytes())
+    return fingerprint.hexdigest()
+
+
+def get_pages_fingerprints(pdf_images: PdfImages, context: str) -> dict[int, str]:
+    if not PAGE_RESULTS_CACHE.enabled:
+        return {}
+    return {
+        page.page_number: get_page_fingerprint(page, page_image, context)
+        for page, page_image in zip(pdf_images.pdf_features.pages, pdf_images.pdf_images)
+    }
+
+
+def get_cached_segments(pdf_images: PdfImages, pages_fingerprints: dict[int, str]) -> dict[int, list[PdfSegment]]:
+    cached_segments: dict[int, list[PdfSegment]] = {}
+    for page_number, fingerprint in pages_fingerprints.items():
+        content = PAGE_RESULTS_CACHE.get(fingerprint)
+        if content is None:
+            continue
+        cached_segments[page_number] = [
+            PdfSegment(
+                page_number,
+                Rectangle.from_width_height(left, top, width, height),
+                text,
+                TokenType(segment_type),
+                pdf_images.pdf_features.file_name,
+            )
+            for left, top, width, height, text, segment_type in json.loads(content)
+        ]
+    return cached_segments
+
+
+def store_segments(pages_fingerprints: dict[int, str], page_numbers: list[int], segments: list[PdfSegment]):
+    segments_by_page: dict[int, list] = {page_number: [] for page_number in page_numbers}
+    for segment in segments:
+        box = segment.bounding_box
+        segment_row = [box.left, box.top, box.width, box.height, segment.text_content, TokenType(segment.segment_type).value]
+        segments_by_page.setdefault(segment.page_number, []).append(segment_row)
+
+    for page_number in page_numbers:
+        if page_number in pages_fingerprints:
+            PAGE_RESULTS_CACHE.put(pages_fingerprints[page_number], json.dumps(segments_by_page[page_number]).encode())
+
+
+def get_pages_view(pdf_images: PdfImages, excluded_pages: Container[int]) -> PdfImages:
+    """Without the excluded pages. Pages keep their numbers, so their image and word grid names do not change"""
+    if not excluded_pages:
+        return pdf_images
+    pages_view = copy.copy(pdf_images)
+    pages_images = [
+        (page, page_image)
+        for page, page_image in zip(pdf_images.pdf_features.pages, pdf_images.pdf_images)
+        if page.page_number not in excluded_pages
+    ]
+    pages_view.pdf_features = pdf_images.pdf_features.model_copy(update={"pages": [page for page, _ in pages_images]})
+    pages_view.pdf_images = [page_image for _, page_image in pages_images]
+    return pages_view
+
+
+def merge_segments(pdf_images: PdfImages, cached_segments: dict[int, list[PdfSegment]], new_segments: list[PdfSegment]):
+    """Cached and new segments in page order, keeping the reading order inside each page"""
+    segments_by_page: dict[int, list[PdfSegment]] = {}
+    for segment in new_segments:
+        segments_by_page.setdefault(segment.page_number, []).append(segment)
+    segments_by_page.update(cached_segments)
+
+    segments = []
+    for page in pdf_images.pdf_features.pages:
+        segments.extend(segments_by_page.get(page.page_number, []))
+    return segments
@@ -0,0 +1,50 @@
+import hashlib
+import json
+from os.path import join
+
+from ..cache.DiskLRUCache import DiskLRUCache
+from ..configuration import VGT_CACHE_PATH, VGT_CACHE_MAX_MB, WORD_GRIDS_PATH
+from ..data_model.PdfImages import PdfImages
+from ..data_model.Prediction import Prediction
+from ..pdf_features.Rectangle import Rectangle
+
+VGT_PREDICTIONS_CACHE = DiskLRUCache(VGT_CACHE_PATH, VGT_CACHE_MAX_MB * 1024 * 1024, ".json")
+
+
+def get_predictions_keys(pdf_images_list: list[PdfImages], context: str) -> dict[str, str]:
+    """Cache key of every page image name: hash of the rendered page and its word grid, the VGT model inputs"""
+    if not VGT_PREDICTIONS_CACHE.enabled:
+        return {}
+
+    predictions_keys = {}
+    for pdf_images in pdf_images_list:
+        for page, page_image in zip(pdf_images.pdf_features.pages, pdf_images.pdf_images):
+            image_id = f"{pdf_images.pdf_features.file_name}_{page.page_number - 1}"
+            key = hashlib.sha256(context.encode())
+            key.update(f"{page_image.width}x{page_image.height}".encode())
+            key.update(page_image.tobytes())
+            with open(join(WORD_GRIDS_PATH, f"{image_id}.pkl"), "rb") as word_grid_file:
+                key.update(word_grid_file.read())
+            predictions_keys[image_id] = key.hexdigest()
+    return predictions_keys
+
+
+def get_cached_predictions(predictions_keys: dict[str, str]) -> dict[str, list[Prediction]]:
+    cached_predictions = {}
+    for image_id, key in predictions_keys.items():
+        content = VGT_PREDICTIONS_CACHE.get(key)
+        if content is None:
+            continue
+        cached_predictions[image_id] = [
+            Prediction(Rectangle.from_width_height(left, top, width, height), category_id, score)
+            for left, top, width, height, category_id, score in json.loads(content)
+        ]
+    return cached_predictions
+
+
+def store_predictions(key: str, predictions: list[Prediction]):
+    predictions_rows = [
+        [p.bounding_box.left, p.bounding_box.top, p.bounding_box.width, p.bounding_box.height, p.category_id, p.score]
+        for p in predictions
+    ]
+    VGT_PREDICTIONS_CACHE.put(key, json.dumps(predictions_rows).encode())
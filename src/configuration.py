@@ -1,4 +1,5 @@
 import logging
+import os
 from pathlib import Path
 
 
@@ -14,12 +15,37 @@ IMAGES_ROOT_PATH = Path(SRC_PATH, "images")
 WORD_GRIDS_PATH = Path(SRC_PATH, "word_grids")
 JSONS_ROOT_PATH = Path(SRC_PATH, "jsons")
 PDF_OUTPUTS_PATH = Path(SRC_PATH, "pdf_outputs")
-OCR_SOURCE = Path(SRC_PATH, "ocr", "source")
-OCR_OUTPUT = Path(SRC_PATH, "ocr", "output")
-OCR_FAILED = Path(SRC_PATH, "ocr", "failed")
+OCR_CACHE_PATH = Path(SRC_PATH, "cache", "ocr")
+PAGE_CACHE_PATH = Path(SRC_PATH, "cache", "pages")
+VGT_CACHE_PATH = Path(SRC_PATH, "cache", "vgt")
 JSON_TEST_FILE_PATH = Path(JSONS_ROOT_PATH, "test.json")
 MODELS_PATH = Path(SRC_PATH, PERSISTED_VOLUME_PATH, "models")
+VGT_QUANTIZED_MODEL_PATH = Path(MODELS_PATH, "doclaynet_VGT_model_int8.pth")
+VGT_EXPORT_PATH = Path(MODELS_PATH, "vgt_backbone")
 XMLS_PATH = Path(SRC_PATH, "xmls")
+PROFILES_PATH = Path(SRC_PATH, "profiles")
+PAGE_WORKERS = int(os.environ.get("PAGE_WORKERS", "0"))
+PAGE_WORKERS_MIN_PAGES = int(os.environ.get("PAGE_WORKERS_MIN_PAGES", "8"))
+OCR_CONCURRENT_JOBS = int(os.environ.get("OCR_CONCURRENT_JOBS", "2"))
+OCR_CACHE_MAX_MB = int(os.environ.get("OCR_CACHE_MAX_MB", "2048"))
+PAGE_CACHE_MAX_MB = int(os.environ.get("PAGE_CACHE_MAX_MB", "512"))
+VGT_CACHE_MAX_MB = int(os.environ.get("VGT_CACHE_MAX_MB", "256"))
+PROFILES_MAX_MB = int(os.environ.get("PROFILES_MAX_MB", "256"))
+BATCH_MAX_DOCUMENTS = int(os.environ.get("BATCH_MAX_DOCUMENTS", "50"))
+INFO_TTL_SECONDS = int(os.environ.get("INFO_TTL_SECONDS", "300"))
+VGT_QUANTIZED = os.environ.get("VGT_QUANTIZED", "false").lower() in ["true", "1"]
+VGT_PRECISION = os.environ.get("VGT_PRECISION", "fp32").lower()
+VGT_EXPORTED_BACKBONE = os.environ.get("VGT_EXPORTED_BACKBONE", "false").lower() in ["true", "1"]
+VGT_ADAPTIVE_RESOLUTION = os.environ.get("VGT_ADAPTIVE_RESOLUTION", "false").lower() in ["true", "1"]
+VGT_SPARSE_PAGE_TOKENS = int(os.environ.get("VGT_SPARSE_PAGE_TOKENS", "60"))
+VGT_SPARSE_PAGE_INK = float(os.environ.get("VGT_SPARSE_PAGE_INK", "0.02"))
+VGT_SPARSE_PAGE_CONTENT = float(os.environ.get("VGT_SPARSE_PAGE_CONTENT", "0.25"))
+VGT_SPARSE_PAGE_MIN_SIZE = int(os.environ.get("VGT_SPARSE_PAGE_MIN_SIZE", "512"))
+AUTO_MIN_PAGE_CONFIDENCE = float(os.environ.get("AUTO_MIN_PAGE_CONFIDENCE", "0.9"))
+PRELOAD_VGT = os.environ.get("PRELOAD_VGT", "true").lower() in ["true", "1"]
+VGT_SAFETENSORS = os.environ.get("VGT_SAFETENSORS", "true").lower() in ["true", "1"]
+VGT_PAGE_ROUTER = os.environ.get("VGT_PAGE_ROUTER", "false").lower() in ["true", "1"]
+VGT_FUSED_ATTENTION = os.environ.get("VGT_FUSED_ATTENTION", "true").lower() in ["true", "1"]
 
 DOCLAYNET_TYPE_BY_ID = {
     1: "Caption",
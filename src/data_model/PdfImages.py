@@ -1,5 +1,4 @@
 import os
-import shutil
 
 import cv2
 import numpy as np
@@ -8,6 +7,7 @@ from os.path import join
 from pathlib import Path
 from PIL import Image
 from pdf2image import convert_from_path
+from ..metrics.pipeline_metrics import timed_stage
 from ..pdf_features.PdfFeatures import PdfFeatures
 
 from ..configuration import IMAGES_ROOT_PATH, XMLS_PATH
@@ -32,9 +32,9 @@ class PdfImages:
             image_name = f"{self.pdf_features.file_name}_{image_index}.jpg"
             image.save(join(IMAGES_ROOT_PATH, image_name))
 
-    @staticmethod
-    def remove_images():
-        shutil.rmtree(IMAGES_ROOT_PATH)
+    def remove_images(self):
+        for image_index in range(len(self.pdf_images)):
+            Path(IMAGES_ROOT_PATH, f"{self.pdf_features.file_name}_{image_index}.jpg").unlink(missing_ok=True)
 
     @staticmethod
     def from_pdf_path(pdf_path: str | Path, pdf_name: str = "", xml_file_name: str = ""):
@@ -50,5 +50,6 @@ class PdfImages:
         else:
             pdf_name = Path(pdf_path).parent.name if Path(pdf_path).name == "document.pdf" else Path(pdf_path).stem
             pdf_features.file_name = pdf_name
-        pdf_images = convert_from_path(pdf_path, dpi=72)
+        with timed_stage("rasterization"):
+            pdf_images = convert_from_path(pdf_path, dpi=72)
         return PdfImages(pdf_features, pdf_images)
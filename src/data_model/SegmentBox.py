@@ -42,6 +42,27 @@ class SegmentBox(BaseModel):
             type=pdf_segment.segment_type,
         )
 
+    @staticmethod
+    def get_segments_dicts(pdf_segments: list[PdfSegment], pdf_pages: list[PdfPage]) -> list[dict]:
+        """Same as from_pdf_segment(...).to_dict() for every segment, without building the pydantic models"""
+        segments_dicts = []
+        for pdf_segment in pdf_segments:
+            pdf_page = pdf_pages[pdf_segment.page_number - 1]
+            segments_dicts.append(
+                {
+                    "left": float(pdf_segment.bounding_box.left),
+                    "top": float(pdf_segment.bounding_box.top),
+                    "width": float(pdf_segment.bounding_box.width),
+                    "height": float(pdf_segment.bounding_box.height),
+                    "page_number": pdf_segment.page_number,
+                    "page_width": int(pdf_page.page_width),
+                    "page_height": int(pdf_page.page_height),
+                    "text": pdf_segment.text_content,
+                    "type": TokenType(pdf_segment.segment_type).value,
+                }
+            )
+        return segments_dicts
+
 
 if __name__ == "__main__":
     a = TokenType.TEXT
@@ -2,6 +2,8 @@
 # Copyright (c) Facebook, Inc. and its affiliates. All Rights Reserved
 import logging
 import numpy as np
+from contextlib import nullcontext
+from time import perf_counter
 from typing import Dict, List, Optional, Tuple
 import torch
 from torch import nn
@@ -16,9 +18,12 @@ from detectron2.modeling.meta_arch.build import META_ARCH_REGISTRY
 from detectron2.modeling.meta_arch.rcnn import GeneralizedRCNN
 
 from .Wordnn_embedding import WordnnEmbedding
+from ..configuration import service_logger
 
 __all__ = ["VGT"]
 
+AUTOCAST_DTYPES = {"bf16": torch.bfloat16, "fp16": torch.float16}
+
 
 def torch_memory(device, tag=""):
     # Checks and prints GPU memory
@@ -50,6 +55,7 @@ class VGT(GeneralizedRCNN):
         self.Wordgrid_embedding = WordnnEmbedding(
             vocab_size, hidden_size, embedding_dim, bros_embedding_path, use_pretrain_weight, use_UNK_text
         )
+        self.inference_precision = "fp32"
 
     @classmethod
     def from_config(cls, cfg):
@@ -146,10 +152,14 @@ class VGT(GeneralizedRCNN):
         """
         assert not self.training
 
+        start = perf_counter()
         images = self.preprocess_image(batched_inputs)
 
-        chargrid = self.Wordgrid_embedding(images.tensor, batched_inputs)
-        features = self.backbone(images.tensor, chargrid)
+        with self.get_autocast_context():
+            chargrid = self.Wordgrid_embedding(images.tensor, batched_inputs)
+            features = self.backbone(images.tensor, chargrid)
+        # the RPN and ROI heads, with the box decoding and NMS, run in FP32
+        features = {name: feature.float() for name, feature in features.items()}
 
         if detected_instances is None:
             if self.proposal_generator is not None:
@@ -165,6 +175,19 @@ class VGT(GeneralizedRCNN):
 
         if do_postprocess:
             assert not torch.jit.is_scripting(), "Scripting is not supported for postprocess."
-            return GeneralizedRCNN._postprocess(results, batched_inputs, images.image_sizes)
-        else:
-            return results
+            results = GeneralizedRCNN._postprocess(results, batched_inputs, images.image_sizes)
+
+        self.log_inference_time(batched_inputs, start)
+        return results
+
+    def get_autocast_context(self):
+        if self.inference_precision == "fp32":
+            return nullcontext()
+        return torch.autocast(self.device.type, dtype=AUTOCAST_DTYPES[self.inference_precision])
+
+    def log_inference_time(self, batched_inputs: List[Dict[str, torch.Tensor]], start: float):
+        if self.device.type == "cuda":
+            torch.cuda.synchronize(self.device)
+        seconds = (perf_counter() - start) / len(batched_inputs)
+        file_names = ", ".join(str(x.get("file_name", "")).split("/")[-1] for x in batched_inputs)
+        service_logger.info(f"VGT {self.inference_precision} inference: {seconds:.3f}s per page ({file_names})")
@@ -24,12 +24,15 @@ Hacked together by / Copyright 2020 Ross Wightman
 import warnings
 import math
 import torch
-from functools import partial
+from collections import OrderedDict
+from functools import lru_cache, partial
 import torch.nn as nn
 import torch.nn.functional as F
 import torch.utils.checkpoint as checkpoint
 from timm.models.layers import drop_path, to_2tuple, trunc_normal_
 
+from ..configuration import VGT_FUSED_ATTENTION
+
 
 def _cfg(url="", **kwargs):
     return {
@@ -54,6 +57,129 @@ def torch_memory(device, tag=""):
     print("")
 
 
+WINDOW_SIZE_CACHE_SIZE = 8
+USE_FUSED_ATTENTION = VGT_FUSED_ATTENTION and hasattr(F, "scaled_dot_product_attention")
+
+
+class WindowSizeCache:
+    """Least recently used tensors computed for the input window sizes, only while running without gradients or tracing"""
+
+    def __init__(self, max_size=WINDOW_SIZE_CACHE_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+
+    def get(self, key, compute):
+        if torch.is_grad_enabled() or torch.jit.is_tracing():
+            return compute()
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        value = compute()
+        self.entries[key] = value
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        return value
+
+    def clear(self, *args):
+        self.entries.clear()
+
+
+def get_tensor_key(tensor, *args):
+    """The version counter changes when the weights are updated in place, the data pointer when they are moved"""
+    return (*args, tensor.device, tensor.dtype, tensor.data_ptr(), tensor._version)
+
+
+def build_relative_position_index(window_size):
+    num_relative_distance = (2 * window_size[0] - 1) * (2 * window_size[1] - 1) + 3
+    # get pair-wise relative position index for each token inside the window
+    coords_h = torch.arange(window_size[0])
+    coords_w = torch.arange(window_size[1])
+    coords = torch.stack(torch.meshgrid([coords_h, coords_w]))  # 2, Wh, Ww
+    coords_flatten = torch.flatten(coords, 1)  # 2, Wh*Ww
+    relative_coords = coords_flatten[:, :, None] - coords_flatten[:, None, :]  # 2, Wh*Ww, Wh*Ww
+    relative_coords = relative_coords.permute(1, 2, 0).contiguous()  # Wh*Ww, Wh*Ww, 2
+    relative_coords[:, :, 0] += window_size[0] - 1  # shift to start from 0
+    relative_coords[:, :, 1] += window_size[1] - 1
+    relative_coords[:, :, 0] *= 2 * window_size[1] - 1
+    relative_position_index = torch.zeros(size=(window_size[0] * window_size[1] + 1,) * 2, dtype=relative_coords.dtype)
+    relative_position_index[1:, 1:] = relative_coords.sum(-1)  # Wh*Ww, Wh*Ww
+    relative_position_index[0, 0:] = num_relative_distance - 3
+    relative_position_index[0:, 0] = num_relative_distance - 2
+    relative_position_index[0, 0] = num_relative_distance - 1
+    return relative_position_index
+
+
+@lru_cache(maxsize=WINDOW_SIZE_CACHE_SIZE)
+def get_relative_position_index(window_size, device):
+    # shared by all the blocks, it only depends on the window size
+    return build_relative_position_index(window_size).to(device)
+
+
+def interpolate_relative_position_bias_table(relative_position_bias_table, num_heads, window_size, training_window_size):
+    new_num_relative_distance = (2 * training_window_size[0] - 1) * (2 * training_window_size[1] - 1) + 3
+    # new_num_relative_dis 为 所有可能的相对位置选项，包含cls-cls，tok-cls，与cls-tok
+    new_relative_position_bias_table = F.interpolate(
+        relative_position_bias_table[:-3, :]
+        .permute(1, 0)
+        .view(1, num_heads, 2 * window_size[0] - 1, 2 * window_size[1] - 1),
+        size=(2 * training_window_size[0] - 1, 2 * training_window_size[1] - 1),
+        mode="bicubic",
+        align_corners=False,
+    )
+    new_relative_position_bias_table = new_relative_position_bias_table.view(
+        num_heads, new_num_relative_distance - 3
+    ).permute(1, 0)
+    return torch.cat([new_relative_position_bias_table, relative_position_bias_table[-3::]], dim=0)
+
+
+def get_relative_position_bias(module, training_window_size):
+    """nH, Wh*Ww+1, Wh*Ww+1 bias of a module with relative_position_bias_table, window_size and num_heads"""
+    training_window_size = tuple(int(size) for size in training_window_size)
+
+    if training_window_size == tuple(module.window_size):
+        relative_position_bias_table = module.relative_position_bias_table
+        relative_position_index = module.relative_position_index
+    else:
+        table = module.relative_position_bias_table
+        relative_position_bias_table = module.bias_tables_cache.get(
+            get_tensor_key(table, training_window_size),
+            lambda: interpolate_relative_position_bias_table(
+                table, module.num_heads, module.window_size, training_window_size
+            ),
+        )
+        relative_position_index = get_relative_position_index(training_window_size, table.device)
+
+    tokens_count = training_window_size[0] * training_window_size[1] + 1
+    relative_position_bias = relative_position_bias_table[relative_position_index.view(-1)].view(
+        tokens_count, tokens_count, -1
+    )  # Wh*Ww,Wh*Ww,nH
+    return relative_position_bias.permute(2, 0, 1).contiguous()  # nH, Wh*Ww, Wh*Ww
+
+
+def linear_with_bias(linear, x, bias):
+    """F.linear with an external bias. Dynamically quantized layers have no weight tensor and only add their own bias"""
+    if isinstance(linear, nn.Linear):
+        return F.linear(input=x, weight=linear.weight, bias=bias)
+    output = linear(x)
+    return output if bias is None else output + bias
+
+
+def get_attention_output(q, k, v, scale, attn_drop, attn_bias=None):
+    """B, nH, N, head_dim attention output. The fused kernels do not materialize the N*N attention matrix"""
+    if USE_FUSED_ATTENTION:
+        dropout_p = attn_drop.p if attn_drop.training else 0.0
+        attn_mask = attn_bias.to(q.dtype) if attn_bias is not None else None
+        return F.scaled_dot_product_attention(q, k, v, attn_mask=attn_mask, dropout_p=dropout_p, scale=scale)
+
+    q = q * scale
+    attn = q @ k.transpose(-2, -1)
+    if attn_bias is not None:
+        attn = attn + attn_bias
+    attn = attn.softmax(dim=-1)
+    attn = attn_drop(attn)
+    return attn @ v
+
+
 class DropPath(nn.Module):
     """Drop paths (Stochastic Depth) per sample  (when applied in main path of residual blocks)."""
 
@@ -129,20 +255,15 @@ class CrossAttention(nn.Module):
         if self.q_bias is not None:
             kv_bias = torch.cat((torch.zeros_like(self.v_bias, requires_grad=False), self.v_bias))
         # qkv = self.qkv(x).reshape(B, N, 3, self.num_heads, C // self.num_heads).permute(2, 0, 3, 1, 4)
-        kv = F.linear(input=y, weight=self.kv.weight, bias=kv_bias)
+        kv = linear_with_bias(self.kv, y, kv_bias)
         kv = kv.reshape(B, N, 2, self.num_heads, -1).permute(2, 0, 3, 1, 4)
         k, v = kv[0], kv[1]  # make torchscript happy (cannot use tensor as tuple)
 
-        q = F.linear(input=x, weight=self.q.weight, bias=self.q_bias)
+        q = linear_with_bias(self.q, x, self.q_bias)
         q = q.reshape(B, N, 1, self.num_heads, -1).permute(2, 0, 3, 1, 4)[0]
 
-        q = q * self.scale
-        attn = q @ k.transpose(-2, -1)
-
-        attn = attn.softmax(dim=-1)
-        attn = self.attn_drop(attn)
-
-        x = (attn @ v).transpose(1, 2).reshape(B, N, -1)
+        x = get_attention_output(q, k, v, self.scale, self.attn_drop)
+        x = x.transpose(1, 2).reshape(B, N, -1)
         x = self.proj(x)
         x = self.proj_drop(x)
         return x
@@ -356,25 +477,10 @@ class Attention(nn.Module):
             )  # 2*Wh-1 * 2*Ww-1, nH
             # cls to token & token 2 cls & cls to cls
 
-            # get pair-wise relative position index for each token inside the window
-            coords_h = torch.arange(window_size[0])
-            coords_w = torch.arange(window_size[1])
-            coords = torch.stack(torch.meshgrid([coords_h, coords_w]))  # 2, Wh, Ww
-            coords_flatten = torch.flatten(coords, 1)  # 2, Wh*Ww
-            relative_coords = coords_flatten[:, :, None] - coords_flatten[:, None, :]  # 2, Wh*Ww, Wh*Ww
-            relative_coords = relative_coords.permute(1, 2, 0).contiguous()  # Wh*Ww, Wh*Ww, 2
-            relative_coords[:, :, 0] += window_size[0] - 1  # shift to start from 0
-            relative_coords[:, :, 1] += window_size[1] - 1
-            relative_coords[:, :, 0] *= 2 * window_size[1] - 1
-            relative_position_index = torch.zeros(
-                size=(window_size[0] * window_size[1] + 1,) * 2, dtype=relative_coords.dtype
-            )
-            relative_position_index[1:, 1:] = relative_coords.sum(-1)  # Wh*Ww, Wh*Ww
-            relative_position_index[0, 0:] = self.num_relative_distance - 3
-            relative_position_index[0:, 0] = self.num_relative_distance - 2
-            relative_position_index[0, 0] = self.num_relative_distance - 1
-
+            relative_position_index = build_relative_position_index(window_size)
             self.register_buffer("relative_position_index", relative_position_index)
+            self.bias_tables_cache = WindowSizeCache()
+            self._register_load_state_dict_pre_hook(self.bias_tables_cache.clear)
 
             # trunc_normal_(self.relative_position_bias_table, std=.0)
         else:
@@ -392,72 +498,17 @@ class Attention(nn.Module):
         if self.q_bias is not None:
             qkv_bias = torch.cat((self.q_bias, torch.zeros_like(self.v_bias, requires_grad=False), self.v_bias))
         # qkv = self.qkv(x).reshape(B, N, 3, self.num_heads, C // self.num_heads).permute(2, 0, 3, 1, 4)
-        qkv = F.linear(input=x, weight=self.qkv.weight, bias=qkv_bias)
+        qkv = linear_with_bias(self.qkv, x, qkv_bias)
         qkv = qkv.reshape(B, N, 3, self.num_heads, -1).permute(2, 0, 3, 1, 4)
         q, k, v = qkv[0], qkv[1], qkv[2]  # make torchscript happy (cannot use tensor as tuple)
 
-        q = q * self.scale
-        attn = q @ k.transpose(-2, -1)
-
+        attn_bias = rel_pos_bias
         if self.relative_position_bias_table is not None:
-            if training_window_size == self.window_size:
-                relative_position_bias = self.relative_position_bias_table[self.relative_position_index.view(-1)].view(
-                    self.window_size[0] * self.window_size[1] + 1, self.window_size[0] * self.window_size[1] + 1, -1
-                )  # Wh*Ww,Wh*Ww,nH
-                relative_position_bias = relative_position_bias.permute(2, 0, 1).contiguous()  # nH, Wh*Ww, Wh*Ww
-                attn = attn + relative_position_bias.unsqueeze(0)
-            else:
-                training_window_size = tuple(training_window_size.tolist())
-                new_num_relative_distance = (2 * training_window_size[0] - 1) * (2 * training_window_size[1] - 1) + 3
-                # new_num_relative_dis 为 所有可能的相对位置选项，包含cls-cls，tok-cls，与cls-tok
-                new_relative_position_bias_table = F.interpolate(
-                    self.relative_position_bias_table[:-3, :]
-                    .permute(1, 0)
-                    .view(1, self.num_heads, 2 * self.window_size[0] - 1, 2 * self.window_size[1] - 1),
-                    size=(2 * training_window_size[0] - 1, 2 * training_window_size[1] - 1),
-                    mode="bicubic",
-                    align_corners=False,
-                )
-                new_relative_position_bias_table = new_relative_position_bias_table.view(
-                    self.num_heads, new_num_relative_distance - 3
-                ).permute(1, 0)
-                new_relative_position_bias_table = torch.cat(
-                    [new_relative_position_bias_table, self.relative_position_bias_table[-3::]], dim=0
-                )
+            relative_position_bias = get_relative_position_bias(self, training_window_size).unsqueeze(0)
+            attn_bias = relative_position_bias if attn_bias is None else relative_position_bias + attn_bias
 
-                # get pair-wise relative position index for each token inside the window
-                coords_h = torch.arange(training_window_size[0])
-                coords_w = torch.arange(training_window_size[1])
-                coords = torch.stack(torch.meshgrid([coords_h, coords_w]))  # 2, Wh, Ww
-                coords_flatten = torch.flatten(coords, 1)  # 2, Wh*Ww
-                relative_coords = coords_flatten[:, :, None] - coords_flatten[:, None, :]  # 2, Wh*Ww, Wh*Ww
-                relative_coords = relative_coords.permute(1, 2, 0).contiguous()  # Wh*Ww, Wh*Ww, 2
-                relative_coords[:, :, 0] += training_window_size[0] - 1  # shift to start from 0
-                relative_coords[:, :, 1] += training_window_size[1] - 1
-                relative_coords[:, :, 0] *= 2 * training_window_size[1] - 1
-                relative_position_index = torch.zeros(
-                    size=(training_window_size[0] * training_window_size[1] + 1,) * 2, dtype=relative_coords.dtype
-                )
-                relative_position_index[1:, 1:] = relative_coords.sum(-1)  # Wh*Ww, Wh*Ww
-                relative_position_index[0, 0:] = new_num_relative_distance - 3
-                relative_position_index[0:, 0] = new_num_relative_distance - 2
-                relative_position_index[0, 0] = new_num_relative_distance - 1
-
-                relative_position_bias = new_relative_position_bias_table[relative_position_index.view(-1)].view(
-                    training_window_size[0] * training_window_size[1] + 1,
-                    training_window_size[0] * training_window_size[1] + 1,
-                    -1,
-                )  # Wh*Ww,Wh*Ww,nH
-                relative_position_bias = relative_position_bias.permute(2, 0, 1).contiguous()  # nH, Wh*Ww, Wh*Ww
-                attn = attn + relative_position_bias.unsqueeze(0)
-
-        if rel_pos_bias is not None:
-            attn = attn + rel_pos_bias
-
-        attn = attn.softmax(dim=-1)
-        attn = self.attn_drop(attn)
-
-        x = (attn @ v).transpose(1, 2).reshape(B, N, -1)
+        x = get_attention_output(q, k, v, self.scale, self.attn_drop, attn_bias)
+        x = x.transpose(1, 2).reshape(B, N, -1)
         x = self.proj(x)
         x = self.proj_drop(x)
         return x
@@ -536,6 +587,12 @@ class PatchEmbed(nn.Module):
         self.num_patches = num_patches
 
         self.proj = nn.Conv2d(in_chans, embed_dim, kernel_size=patch_size, stride=patch_size, bias=bias)
+        self.position_embeddings_cache = WindowSizeCache()
+        self._register_load_state_dict_pre_hook(self.position_embeddings_cache.clear)
+
+    def interpolate_position_embedding(self, position_embedding, Hp, Wp):
+        position_embedding = position_embedding.view(1, self.patch_shape[0], self.patch_shape[1], -1).permute(0, 3, 1, 2)
+        return F.interpolate(position_embedding, size=(Hp, Wp), mode="bicubic")
 
     def forward(self, x, position_embedding=None, **kwargs):
         # FIXME look at relaxing size constraints
@@ -546,8 +603,10 @@ class PatchEmbed(nn.Module):
 
         if position_embedding is not None:
             # interpolate the position embedding to the corresponding size
-            position_embedding = position_embedding.view(1, self.patch_shape[0], self.patch_shape[1], -1).permute(0, 3, 1, 2)
-            position_embedding = F.interpolate(position_embedding, size=(Hp, Wp), mode="bicubic")
+            position_embedding = self.position_embeddings_cache.get(
+                get_tensor_key(position_embedding, Hp, Wp),
+                lambda: self.interpolate_position_embedding(position_embedding, Hp, Wp),
+            )
             x = x + position_embedding
 
         x = x.flatten(2).transpose(1, 2)
@@ -602,76 +661,15 @@ class RelativePositionBias(nn.Module):
         )  # 2*Wh-1 * 2*Ww-1, nH
         # cls to token & token 2 cls & cls to cls
 
-        # get pair-wise relative position index for each token inside the window
-        coords_h = torch.arange(window_size[0])
-        coords_w = torch.arange(window_size[1])
-        coords = torch.stack(torch.meshgrid([coords_h, coords_w]))  # 2, Wh, Ww
-        coords_flatten = torch.flatten(coords, 1)  # 2, Wh*Ww
-        relative_coords = coords_flatten[:, :, None] - coords_flatten[:, None, :]  # 2, Wh*Ww, Wh*Ww
-        relative_coords = relative_coords.permute(1, 2, 0).contiguous()  # Wh*Ww, Wh*Ww, 2
-        relative_coords[:, :, 0] += window_size[0] - 1  # shift to start from 0
-        relative_coords[:, :, 1] += window_size[1] - 1
-        relative_coords[:, :, 0] *= 2 * window_size[1] - 1
-        relative_position_index = torch.zeros(size=(window_size[0] * window_size[1] + 1,) * 2, dtype=relative_coords.dtype)
-        relative_position_index[1:, 1:] = relative_coords.sum(-1)  # Wh*Ww, Wh*Ww
-        relative_position_index[0, 0:] = self.num_relative_distance - 3
-        relative_position_index[0:, 0] = self.num_relative_distance - 2
-        relative_position_index[0, 0] = self.num_relative_distance - 1
-
+        relative_position_index = build_relative_position_index(window_size)
         self.register_buffer("relative_position_index", relative_position_index)
+        self.bias_tables_cache = WindowSizeCache()
+        self._register_load_state_dict_pre_hook(self.bias_tables_cache.clear)
 
         # trunc_normal_(self.relative_position_bias_table, std=.02)
 
     def forward(self, training_window_size):
-        if training_window_size == self.window_size:
-            relative_position_bias = self.relative_position_bias_table[self.relative_position_index.view(-1)].view(
-                self.window_size[0] * self.window_size[1] + 1, self.window_size[0] * self.window_size[1] + 1, -1
-            )  # Wh*Ww,Wh*Ww,nH
-            relative_position_bias = relative_position_bias.permute(2, 0, 1).contiguous()  # nH, Wh*Ww, Wh*Ww
-        else:
-            training_window_size = tuple(training_window_size.tolist())
-            new_num_relative_distance = (2 * training_window_size[0] - 1) * (2 * training_window_size[1] - 1) + 3
-            # new_num_relative_dis 为 所有可能的相对位置选项，包含cls-cls，tok-cls，与cls-tok
-            new_relative_position_bias_table = F.interpolate(
-                self.relative_position_bias_table[:-3, :]
-                .permute(1, 0)
-                .view(1, self.num_heads, 2 * self.window_size[0] - 1, 2 * self.window_size[1] - 1),
-                size=(2 * training_window_size[0] - 1, 2 * training_window_size[1] - 1),
-                mode="bicubic",
-                align_corners=False,
-            )
-            new_relative_position_bias_table = new_relative_position_bias_table.view(
-                self.num_heads, new_num_relative_distance - 3
-            ).permute(1, 0)
-            new_relative_position_bias_table = torch.cat(
-                [new_relative_position_bias_table, self.relative_position_bias_table[-3::]], dim=0
-            )
-
-            # get pair-wise relative position index for each token inside the window
-            coords_h = torch.arange(training_window_size[0])
-            coords_w = torch.arange(training_window_size[1])
-            coords = torch.stack(torch.meshgrid([coords_h, coords_w]))  # 2, Wh, Ww
-            coords_flatten = torch.flatten(coords, 1)  # 2, Wh*Ww
-            relative_coords = coords_flatten[:, :, None] - coords_flatten[:, None, :]  # 2, Wh*Ww, Wh*Ww
-            relative_coords = relative_coords.permute(1, 2, 0).contiguous()  # Wh*Ww, Wh*Ww, 2
-            relative_coords[:, :, 0] += training_window_size[0] - 1  # shift to start from 0
-            relative_coords[:, :, 1] += training_window_size[1] - 1
-            relative_coords[:, :, 0] *= 2 * training_window_size[1] - 1
-            relative_position_index = torch.zeros(
-                size=(training_window_size[0] * training_window_size[1] + 1,) * 2, dtype=relative_coords.dtype
-            )
-            relative_position_index[1:, 1:] = relative_coords.sum(-1)  # Wh*Ww, Wh*Ww
-            relative_position_index[0, 0:] = new_num_relative_distance - 3
-            relative_position_index[0:, 0] = new_num_relative_distance - 2
-            relative_position_index[0, 0] = new_num_relative_distance - 1
-
-            relative_position_bias = new_relative_position_bias_table[relative_position_index.view(-1)].view(
-                training_window_size[0] * training_window_size[1] + 1,
-                training_window_size[0] * training_window_size[1] + 1,
-                -1,
-            )  # Wh*Ww,Wh*Ww,nH
-            relative_position_bias = relative_position_bias.permute(2, 0, 1).contiguous()  # nH, Wh*Ww, Wh*Ww
-
+        relative_position_bias = get_relative_position_bias(self, training_window_size)
         return relative_position_bias
 
 
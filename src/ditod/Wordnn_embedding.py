@@ -3,6 +3,7 @@ import torch
 from torch import nn
 from .tokenization_bros import BrosTokenizer
 from ..configuration import MODELS_PATH
+from ..vgt.safetensors_weights import get_word_embeddings
 from pathlib import Path
 
 
@@ -51,20 +52,15 @@ class WordnnEmbedding(nn.Module):
             return
 
         print(f"Loading weights from {self.bros_embedding_path}")
-        state_dict = torch.load(
-            Path(MODELS_PATH, self.bros_embedding_path) / "pytorch_model.bin", 
-            map_location="cpu",
-            weights_only=True
-        )
-
         if "bert" in self.bros_embedding_path:
-            word_embs = state_dict["bert.embeddings.word_embeddings.weight"]
+            key = "bert.embeddings.word_embeddings.weight"
         elif "bros" in self.bros_embedding_path:
-            word_embs = state_dict["embeddings.word_embeddings.weight"]
+            key = "embeddings.word_embeddings.weight"
         elif "layoutlm" in self.bros_embedding_path:
-            word_embs = state_dict["layoutlm.embeddings.word_embeddings.weight"]
+            key = "layoutlm.embeddings.word_embeddings.weight"
         else:
             raise ValueError(f"Unsupported model path: {self.bros_embedding_path}")
+        word_embs = get_word_embeddings(Path(MODELS_PATH, self.bros_embedding_path), key)
 
         # Get current model device and move weights to it
         device = next(self.parameters()).device
@@ -26,6 +26,8 @@ from detectron2.structures import (
     polygons_to_bitmask,
 )
 
+from ..vgt.adaptive_resolution import RESOLUTION_POLICY, get_test_sizes
+
 __all__ = ["DetrDatasetMapper"]
 
 
@@ -143,7 +145,12 @@ class DetrDatasetMapper:
 
         image_shape_ori = image.shape[:2]  # h, w
 
-        if self.crop_gen is None:
+        if not self.is_train and RESOLUTION_POLICY["enabled"]:
+            min_size, max_size = get_test_sizes(
+                image, len(bbox_subword_list), self.cfg.INPUT.MIN_SIZE_TEST, self.cfg.INPUT.MAX_SIZE_TEST
+            )
+            image, transforms = T.apply_transform_gens([T.ResizeShortestEdge(min_size, max_size, "choice")], image)
+        elif self.crop_gen is None:
             if image_shape_ori[0] > image_shape_ori[1]:
                 image, transforms = T.apply_transform_gens(self.tfm_gens, image)
             else:
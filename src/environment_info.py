@@ -0,0 +1,81 @@
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from .configuration import MODELS_PATH, INFO_TTL_SECONDS, service_logger
+from .ocr.languages import supported_languages
+from .pdf_layout_analysis import run_pdf_layout_analysis
+from .pdf_tokens_type_trainer.PdfTrainer import PdfTrainer
+
+MODEL_FILES = [
+    "doclaynet_VGT_model.pth",
+    "doclaynet_VGT_model.safetensors",
+    "doclaynet_VGT_model_int8.pth",
+    "token_type_lightgbm.model",
+    "paragraph_extraction_lightgbm.model",
+    "config.json",
+]
+
+_environment: dict | None = None
+_environment_time: float = 0
+_environment_lock = threading.Lock()
+
+
+def get_command_output(command: list[str]) -> str:
+    try:
+        return subprocess.run(command, text=True, capture_output=True, timeout=30).stdout
+    except (FileNotFoundError, subprocess.TimeoutExpired):
+        return ""
+
+
+def get_model_versions() -> dict[str, dict | None]:
+    model_versions = {}
+    for model_file in MODEL_FILES:
+        model_path = Path(MODELS_PATH, model_file)
+        if not model_path.exists():
+            model_versions[model_file] = None
+            continue
+        stat = model_path.stat()
+        modified = datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat()
+        model_versions[model_file] = {"size": stat.st_size, "modified": modified}
+    return model_versions
+
+
+def probe_environment() -> dict:
+    service_logger.info("Probing environment for /info")
+    return {
+        "sys": sys.version,
+        "tesseract_version": get_command_output(["tesseract", "--version"]),
+        "ocrmypdf_version": get_command_output(["ocrmypdf", "--version"]),
+        "supported_languages": supported_languages(),
+        "model_versions": get_model_versions(),
+        "probed_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def get_environment(refresh: bool = False) -> dict:
+    """Environment probe memoized for INFO_TTL_SECONDS. Blocking, call it off the event loop"""
+    global _environment, _environment_time
+    with _environment_lock:
+        if refresh or _environment is None or time.monotonic() - _environment_time > INFO_TTL_SECONDS:
+            _environment = probe_environment()
+            _environment_time = time.monotonic()
+        return _environment
+
+
+def get_loaded_models() -> dict:
+    import torch
+
+    return {
+        "vgt": run_pdf_layout_analysis._model is not None,
+        "vgt_int8": run_pdf_layout_analysis._quantized_model is not None,
+        "lightgbm": PdfTrainer.get_lightgbm_model.cache_info().currsize,
+        "gpu": torch.cuda.is_available(),
+    }
+
+
+def get_info(refresh: bool = False) -> dict:
+    return {**get_environment(refresh), "loaded_models": get_loaded_models()}
@@ -1,8 +1,8 @@
 import io
 from PIL.Image import Image
-from rapid_latex_ocr import LaTeXOCR
 from ..data_model.PdfImages import PdfImages
 from ..fast_trainer.PdfSegment import PdfSegment
+from ..metrics.pipeline_metrics import timed_stage
 from ..pdf_token_type_labels.TokenType import TokenType
 
 
@@ -10,7 +10,7 @@ def has_arabic(text: str) -> bool:
     return any("\u0600" <= char <= "\u06FF" or "\u0750" <= char <= "\u077F" for char in text)
 
 
-def get_latex_format(model: LaTeXOCR, formula_image: Image):
+def get_latex_format(model, formula_image: Image):
     buffer = io.BytesIO()
     formula_image.save(buffer, format="jpeg")
     image_bytes = buffer.getvalue()
@@ -18,6 +18,7 @@ def get_latex_format(model: LaTeXOCR, formula_image: Image):
     return result
 
 
+@timed_stage("formula_extraction")
 def extract_formula_format(pdf_images: PdfImages, predicted_segments: list[PdfSegment]):
     formula_segments = [
         (index, segment) for index, segment in enumerate(predicted_segments) if segment.segment_type == TokenType.FORMULA
@@ -25,6 +26,8 @@ def extract_formula_format(pdf_images: PdfImages, predicted_segments: list[PdfSe
     if not formula_segments:
         return
 
+    from rapid_latex_ocr import LaTeXOCR
+
     model = LaTeXOCR()
 
     for index, formula_segment in formula_segments:
@@ -1,13 +1,12 @@
 import time
 from typing import Optional
 
-import torch
 from PIL import Image
-from struct_eqtable import build_model
 
 from ..configuration import service_logger
 from ..data_model.PdfImages import PdfImages
 from ..fast_trainer.PdfSegment import PdfSegment
+from ..metrics.pipeline_metrics import timed_stage
 from ..pdf_token_type_labels.TokenType import TokenType
 
 
@@ -18,6 +17,7 @@ def get_table_format(
     max_waiting_time: int = 1000,
     extraction_format: str = "latex",
 ) -> str:
+    import torch
     from pypandoc import convert_text
 
     if not raw_image:
@@ -43,6 +43,7 @@ def get_table_format(
 
 
 def get_model():
+    from struct_eqtable import build_model
 
     ckpt_path: str = "U4R/StructTable-base"
     max_new_tokens: int = 2048
@@ -58,6 +59,7 @@ def get_model():
     return model
 
 
+@timed_stage("table_extraction")
 def extract_table_format(pdf_images: PdfImages, predicted_segments: list[PdfSegment], extraction_format: str):
     table_segments = [
         (index, segment) for index, segment in enumerate(predicted_segments) if segment.segment_type == TokenType.TABLE
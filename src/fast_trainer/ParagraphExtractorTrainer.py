@@ -2,6 +2,7 @@ from pathlib import Path
 
 from ..fast_trainer.Paragraph import Paragraph
 from ..fast_trainer.PdfSegment import PdfSegment
+from ..metrics.pipeline_metrics import timed_stage
 from ..pdf_features.PdfToken import PdfToken
 from ..pdf_token_type_labels.TokenType import TokenType
 from ..pdf_tokens_type_trainer.TokenFeatures import TokenFeatures
@@ -37,6 +38,7 @@ class ParagraphExtractorTrainer(TokenTypeTrainer):
                 for token, next_token in zip(page.tokens, page.tokens[1:]):
                     yield page, token, next_token
 
+    @timed_stage("paragraph_extraction")
     def get_pdf_segments(self, paragraph_extractor_model_path: str | Path) -> list[PdfSegment]:
         paragraphs = self.get_paragraphs(paragraph_extractor_model_path)
         pdf_segments = [PdfSegment.from_pdf_tokens(paragraph.tokens, paragraph.pdf_name) for paragraph in paragraphs]
@@ -0,0 +1,34 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+os.environ.setdefault("PYTORCH_NVML_BASED_CUDA_CHECK", "1")
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", str(Path(tempfile.gettempdir(), "pdf_analysis_metrics")))
+shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+bind = os.environ.get("BIND", "0.0.0.0:5060")
+workers = int(os.environ.get("WORKERS", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.environ.get("PRELOAD_MODELS", "true").lower() == "true"
+timeout = int(os.environ.get("WORKER_TIMEOUT", "10000"))
+
+
+def when_ready(server):
+    if preload_app:
+        from src.pdf_layout_analysis.preload_models import preload_models
+
+        preload_models()
+
+
+def post_fork(server, worker):
+    from src.pdf_layout_analysis.preload_models import set_worker_threads
+
+    set_worker_threads(workers)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
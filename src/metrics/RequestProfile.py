@@ -0,0 +1,47 @@
+import json
+import uuid
+from contextvars import ContextVar
+from typing import Optional
+
+
+class RequestProfile:
+    def __init__(self):
+        self.profile_id: str = str(uuid.uuid1())
+        self.stages: dict[str, dict[str, float]] = dict()
+        self.pages: int = 0
+        self.tokens: int = 0
+        self.wall_time: float = 0
+        self.cpu_time: float = 0
+        self.pstats_saved: bool = False
+
+    def add_stage(self, stage: str, wall_time: float, cpu_time: float):
+        stage_times = self.stages.setdefault(stage, {"calls": 0, "wall_time": 0, "cpu_time": 0})
+        stage_times["calls"] += 1
+        stage_times["wall_time"] += wall_time
+        stage_times["cpu_time"] += cpu_time
+
+    def add_document(self, pages: int, tokens: int):
+        self.pages += pages
+        self.tokens += tokens
+
+    def to_dict(self):
+        return {
+            "profile_id": self.profile_id if self.pstats_saved else None,
+            "wall_time": round(self.wall_time, 4),
+            "cpu_time": round(self.cpu_time, 4),
+            "pages": self.pages,
+            "tokens": self.tokens,
+            "stages": {
+                stage: {key: round(value, 4) for key, value in stage_times.items()}
+                for stage, stage_times in self.stages.items()
+            },
+        }
+
+    def get_headers(self) -> dict[str, str]:
+        headers = {"X-Stage-Profile": json.dumps(self.to_dict(), separators=(",", ":"))}
+        if self.pstats_saved:
+            headers["X-Profile-Id"] = self.profile_id
+        return headers
+
+
+ACTIVE_PROFILE: ContextVar[Optional[RequestProfile]] = ContextVar("active_profile", default=None)
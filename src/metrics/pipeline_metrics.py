@@ -0,0 +1,79 @@
+from contextlib import contextmanager
+from time import perf_counter, thread_time
+
+import os
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+
+from ..fast_trainer.PdfSegment import PdfSegment
+from .RequestProfile import ACTIVE_PROFILE
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+STAGE_DURATION = Histogram(
+    "pdf_analysis_stage_duration_seconds",
+    "Wall time spent in each pipeline stage",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+PAGES_PROCESSED = Counter("pdf_analysis_pages_total", "Pages that went through the pipeline", ["model"])
+TOKENS_PROCESSED = Counter("pdf_analysis_tokens_total", "Tokens extracted by pdftohtml and analyzed", ["model"])
+SEGMENTS_RETURNED = Counter("pdf_analysis_segments_total", "Segments returned by the pipeline", ["model", "type"])
+PAGE_ROUTES = Counter("pdf_analysis_page_routes_total", "Pages by route, the trivial ones skip VGT", ["route"])
+MODEL_MEMORY = Gauge(
+    "pdf_analysis_model_memory_bytes",
+    "Memory held by loaded model weights",
+    ["model", "device"],
+    multiprocess_mode="max",
+)
+
+
+def get_metrics_registry():
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+@contextmanager
+def timed_stage(stage: str):
+    start, cpu_start = perf_counter(), thread_time()
+    try:
+        yield
+    finally:
+        wall_time = perf_counter() - start
+        STAGE_DURATION.labels(stage=stage).observe(wall_time)
+        request_profile = ACTIVE_PROFILE.get()
+        if request_profile:
+            request_profile.add_stage(stage, wall_time, thread_time() - cpu_start)
+
+
+def count_pages_and_tokens(pdf_features, model: str):
+    pages_count = len(pdf_features.pages)
+    tokens_count = sum(len(page.tokens) for page in pdf_features.pages)
+    PAGES_PROCESSED.labels(model=model).inc(pages_count)
+    TOKENS_PROCESSED.labels(model=model).inc(tokens_count)
+    request_profile = ACTIVE_PROFILE.get()
+    if request_profile:
+        request_profile.add_document(pages_count, tokens_count)
+
+
+def count_segments(pdf_segments: list[PdfSegment], model: str):
+    for pdf_segment in pdf_segments:
+        SEGMENTS_RETURNED.labels(model=model, type=pdf_segment.segment_type.value).inc()
+
+
+def count_page_route(route: str):
+    PAGE_ROUTES.labels(route=route).inc()
+
+
+def set_torch_model_memory(model_name: str, model):
+    tensors = list(model.parameters()) + list(model.buffers())
+    memory = sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+    device = str(tensors[0].device) if tensors else "cpu"
+    MODEL_MEMORY.labels(model=model_name, device=device).set(memory)
+
+
+def set_lightgbm_model_memory(model_name: str, lightgbm_model):
+    MODEL_MEMORY.labels(model=model_name, device="cpu").set(len(lightgbm_model.model_to_string()))
@@ -0,0 +1,56 @@
+import cProfile
+import os
+import tempfile
+from pathlib import Path
+from time import perf_counter, thread_time
+
+from ..cache.DiskLRUCache import DiskLRUCache
+from ..configuration import PROFILES_PATH, PROFILES_MAX_MB, service_logger
+from .RequestProfile import RequestProfile, ACTIVE_PROFILE
+
+PROFILES_CACHE = DiskLRUCache(PROFILES_PATH, PROFILES_MAX_MB * 1024 * 1024, ".pstats")
+
+
+def get_pstats_path(profile_id: str) -> Path:
+    return PROFILES_CACHE.get_path(Path(profile_id).name)
+
+
+def save_pstats(profiler: cProfile.Profile, profile_id: str) -> bool:
+    """Profiles not downloaded are evicted, oldest first, once the directory exceeds PROFILES_MAX_MB"""
+    if not PROFILES_CACHE.enabled:
+        return False
+    os.makedirs(PROFILES_PATH, exist_ok=True)
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=PROFILES_PATH)
+    os.close(file_descriptor)
+    try:
+        profiler.dump_stats(temporary_path)
+        PROFILES_CACHE.put_file(profile_id, temporary_path)
+    finally:
+        os.unlink(temporary_path)
+    return PROFILES_CACHE.get_path(profile_id).exists()
+
+
+def profile_request(func, *args, **kwargs):
+    request_profile = RequestProfile()
+    profiler = cProfile.Profile()
+    token = ACTIVE_PROFILE.set(request_profile)
+    start, cpu_start = perf_counter(), thread_time()
+    try:
+        profiler.enable()
+    except ValueError:
+        service_logger.info("Another profiler is active, returning the stage breakdown only")
+        profiler = None
+
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        if profiler:
+            profiler.disable()
+        request_profile.wall_time = perf_counter() - start
+        request_profile.cpu_time = thread_time() - cpu_start
+        ACTIVE_PROFILE.reset(token)
+
+    if profiler:
+        request_profile.pstats_saved = save_pstats(profiler, request_profile.profile_id)
+
+    return result, request_profile
@@ -167,8 +167,10 @@ iso_to_tesseract = {
 
 
 def supported_languages():
-    cmd = "tesseract --list-langs | grep -v osd | awk '{if(NR>1)print}'"
-    sp = subprocess.Popen(["/bin/bash", "-c", cmd], stdout=subprocess.PIPE)
-    tesseract_langs = [line.strip().decode("utf-8") for line in sp.stdout.readlines()]
+    try:
+        output = subprocess.run(["tesseract", "--list-langs"], text=True, capture_output=True, timeout=30).stdout
+    except (FileNotFoundError, subprocess.TimeoutExpired):
+        return []
+    tesseract_langs = [line.strip() for line in output.splitlines()[1:] if line.strip() and line.strip() != "osd"]
     inverted_iso_dict = {v: k for k, v in iso_to_tesseract.items()}
-    return list({tesseract_key: inverted_iso_dict[tesseract_key] for tesseract_key in tesseract_langs}.values())
+    return list({key: inverted_iso_dict[key] for key in tesseract_langs if key in inverted_iso_dict}.values())
@@ -1,37 +1,182 @@
+import hashlib
 import os
 import shutil
 import subprocess
+import tempfile
+import threading
 from pathlib import Path
 
-from ..configuration import OCR_SOURCE, OCR_OUTPUT, OCR_FAILED
+import anyio
+from pdf2image import convert_from_path
+
+from ..cache.DiskLRUCache import DiskLRUCache
+from ..configuration import OCR_CONCURRENT_JOBS, service_logger
+from ..configuration import OCR_CACHE_PATH, OCR_CACHE_MAX_MB
 from ..ocr.languages import iso_to_tesseract
+from ..pdf_features.PdfFeatures import PdfFeatures
+
+_ocr_limiter: anyio.CapacityLimiter | None = None
+_ocr_semaphore = threading.BoundedSemaphore(OCR_CONCURRENT_JOBS)
+OCR_CACHE = DiskLRUCache(OCR_CACHE_PATH, OCR_CACHE_MAX_MB * 1024 * 1024, ".pdf")
+OCR_CACHE_HASH_DPI = 100
+
+
+def get_cpu_budget() -> int:
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota != "max":
+            return max(1, int(int(quota) / int(period)))
+    except (FileNotFoundError, ValueError):
+        pass
+
+    try:
+        quota = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_quota_us").read_text())
+        period = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_period_us").read_text())
+        if quota > 0:
+            return max(1, int(quota / period))
+    except (FileNotFoundError, ValueError):
+        pass
+
+    return len(os.sched_getaffinity(0))
+
+
+def get_ocr_jobs() -> int:
+    return max(1, get_cpu_budget() // OCR_CONCURRENT_JOBS)
+
+
+def get_pages_without_text(pdf_path: str | Path) -> list[int] | None:
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        xml_path = Path(temporary_directory, "pdf.xml")
+        subprocess.run(
+            ["pdftohtml", "-nodrm", "-i", "-hidden", "-xml", "-zoom", "1.0", str(pdf_path), str(xml_path)],
+            capture_output=True,
+        )
+        return PdfFeatures.get_pages_without_text(str(xml_path))
+
+
+def run_ocrmypdf(source_pdf_filepath: Path, processed_pdf_filepath: Path, language: str, pages: list[int] = None) -> bool:
+    command = ["ocrmypdf", "-l", iso_to_tesseract[language], "--jobs", str(get_ocr_jobs()), "--force-ocr"]
+    if pages:
+        command += ["--pages", ",".join(str(page_number) for page_number in pages)]
+
+    with _ocr_semaphore:
+        result = subprocess.run(command + [source_pdf_filepath, processed_pdf_filepath])
+
+    return result.returncode == 0
+
+
+def get_pages_count(pdf_path: Path) -> int:
+    result = subprocess.run(["qpdf", "--show-npages", pdf_path], capture_output=True, text=True)
+    return int(result.stdout.strip())
+
+
+def select_pages(source_pdf_filepath: Path, pages_selection: list[str], output_pdf_filepath: Path) -> bool:
+    command = ["qpdf", source_pdf_filepath, "--pages"] + pages_selection + ["--", output_pdf_filepath]
+    return subprocess.run(command, capture_output=True).returncode in [0, 3]
+
+
+def get_pages_runs(pages: list[int]) -> list[tuple[int, int]]:
+    runs = []
+    for page_number in sorted(set(pages)):
+        if runs and runs[-1][1] + 1 == page_number:
+            runs[-1] = (runs[-1][0], page_number)
+        else:
+            runs.append((page_number, page_number))
+    return runs
+
+
+def get_pages_hashes(pdf_path: Path, pages: list[int], temporary_directory: str) -> dict[int, str]:
+    """Renders only the requested pages, one pdftoppm call per run of consecutive pages"""
+    pages_hashes = {}
+    for first_page, last_page in get_pages_runs(pages):
+        images_paths = convert_from_path(
+            pdf_path,
+            dpi=OCR_CACHE_HASH_DPI,
+            first_page=first_page,
+            last_page=last_page,
+            output_folder=temporary_directory,
+            fmt="ppm",
+            paths_only=True,
+        )
+        for page_number, image_path in enumerate(images_paths, start=first_page):
+            pages_hashes[page_number] = hashlib.sha256(Path(image_path).read_bytes()).hexdigest()
+            Path(image_path).unlink()
+    return pages_hashes
+
+
+def get_stitch_selection(source_pdf_filepath: Path, pages_count: int, ocr_pages: dict[int, Path]) -> list[str]:
+    pages_selection = []
+    page_number = 1
+    while page_number <= pages_count:
+        if page_number in ocr_pages:
+            pages_selection += [str(ocr_pages[page_number]), "1"]
+            page_number += 1
+            continue
+        last_page = page_number
+        while last_page + 1 <= pages_count and last_page + 1 not in ocr_pages:
+            last_page += 1
+        pages_selection += [str(source_pdf_filepath), f"{page_number}-{last_page}"]
+        page_number = last_page + 1
+    return pages_selection
+
+
+def ocr_pages_with_cache(source_pdf_filepath: Path, processed_pdf_filepath: Path, pages: list[int], language: str) -> bool:
+    """OCRs only the pages missing from the cache, then stitches the OCR pages with the source pages"""
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        pages_hashes = get_pages_hashes(source_pdf_filepath, pages, temporary_directory)
+        cache_keys = {page_number: f"{pages_hashes[page_number]}_{iso_to_tesseract[language]}" for page_number in pages}
+        ocr_pages = {page_number: Path(temporary_directory, f"page_{page_number}.pdf") for page_number in pages}
+        missing_pages = [page for page in pages if not OCR_CACHE.copy_to(cache_keys[page], ocr_pages[page])]
+        service_logger.info(f"OCR cache hits: {len(pages) - len(missing_pages)} of {len(pages)} pages")
+
+        if missing_pages:
+            missing_pdf_filepath = Path(temporary_directory, "missing.pdf")
+            missing_ocr_pdf_filepath = Path(temporary_directory, "missing_ocr.pdf")
+            missing_selection = [str(source_pdf_filepath), ",".join(str(page) for page in missing_pages)]
+            if not select_pages(source_pdf_filepath, missing_selection, missing_pdf_filepath):
+                return False
+            if not run_ocrmypdf(missing_pdf_filepath, missing_ocr_pdf_filepath, language):
+                return False
+
+            for index, page_number in enumerate(missing_pages, start=1):
+                page_selection = [str(missing_ocr_pdf_filepath), str(index)]
+                if not select_pages(missing_ocr_pdf_filepath, page_selection, ocr_pages[page_number]):
+                    return False
+                OCR_CACHE.put_file(cache_keys[page_number], ocr_pages[page_number])
+
+        pages_count = get_pages_count(source_pdf_filepath)
+        pages_selection = get_stitch_selection(source_pdf_filepath, pages_count, ocr_pages)
+        return select_pages(source_pdf_filepath, pages_selection, processed_pdf_filepath)
+
+
+def ocr_pdf_path(source_pdf_filepath: Path, processed_pdf_filepath: Path, language: str = "en") -> bool:
+    pages_without_text = get_pages_without_text(source_pdf_filepath)
+    if pages_without_text == []:
+        service_logger.info(f"All pages of {source_pdf_filepath.name} already have text, skipping OCR")
+        shutil.copyfile(source_pdf_filepath, processed_pdf_filepath)
+        return True
+
+    if pages_without_text:
+        service_logger.info(f"OCR of {len(pages_without_text)} pages without text of {source_pdf_filepath.name}")
+
+    if OCR_CACHE.enabled:
+        pages = pages_without_text or list(range(1, get_pages_count(source_pdf_filepath) + 1))
+        return ocr_pages_with_cache(source_pdf_filepath, processed_pdf_filepath, pages, language)
+
+    return run_ocrmypdf(source_pdf_filepath, processed_pdf_filepath, language, pages_without_text)
+
+
+def ocr_pdf_in_place(pdf_path: Path, language: str = "en"):
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        processed_pdf_filepath = Path(temporary_directory, pdf_path.name)
+        if not ocr_pdf_path(pdf_path, processed_pdf_filepath, language):
+            pdf_path.unlink(missing_ok=True)
+            raise RuntimeError(f"OCR failed for language {language}")
+        shutil.move(processed_pdf_filepath, pdf_path)
 
 
-def get_paths(namespace: str, pdf_file_name: str):
-    file_name = "".join(pdf_file_name.split(".")[:-1]) if "." in pdf_file_name else pdf_file_name
-    source_pdf_filepath = Path(OCR_SOURCE, namespace, pdf_file_name)
-    processed_pdf_filepath = Path(OCR_OUTPUT, namespace, f"{file_name}.pdf")
-    failed_pdf_filepath = Path(OCR_FAILED, namespace, pdf_file_name)
-    return source_pdf_filepath, processed_pdf_filepath, failed_pdf_filepath
-
-
-def ocr_pdf(filename, namespace, language="en"):
-    source_pdf_filepath, processed_pdf_filepath, failed_pdf_filepath = get_paths(namespace, filename)
-    os.makedirs(processed_pdf_filepath.parent, exist_ok=True)
-    result = subprocess.run(
-        [
-            "ocrmypdf",
-            "-l",
-            iso_to_tesseract[language],
-            source_pdf_filepath,
-            processed_pdf_filepath,
-            "--force-ocr",
-        ]
-    )
-
-    if result.returncode == 0:
-        return processed_pdf_filepath
-
-    os.makedirs(failed_pdf_filepath.parent, exist_ok=True)
-    shutil.move(source_pdf_filepath, failed_pdf_filepath)
-    return False
+async def run_in_ocr_pool(function, *args):
+    global _ocr_limiter
+    if _ocr_limiter is None:
+        _ocr_limiter = anyio.CapacityLimiter(OCR_CONCURRENT_JOBS)
+    return await anyio.to_thread.run_sync(function, *args, limiter=_ocr_limiter)
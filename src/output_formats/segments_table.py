@@ -0,0 +1,55 @@
+from ..pdf_token_type_labels.TokenType import TokenType
+
+SEGMENTS_TABLE_MEDIA_TYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+TYPES_VALUES = [token_type.value for token_type in TokenType]
+
+
+def get_segments_table(segment_boxes: list[dict], file_names: list[str] | None = None):
+    """One row per segment, the type (and file name) columns are dictionary encoded"""
+    import pyarrow
+
+    type_indexes = {type_value: index for index, type_value in enumerate(TYPES_VALUES)}
+    columns = {
+        "page_number": pyarrow.array([box["page_number"] for box in segment_boxes], pyarrow.int32()),
+        "left": pyarrow.array([box["left"] for box in segment_boxes], pyarrow.float32()),
+        "top": pyarrow.array([box["top"] for box in segment_boxes], pyarrow.float32()),
+        "width": pyarrow.array([box["width"] for box in segment_boxes], pyarrow.float32()),
+        "height": pyarrow.array([box["height"] for box in segment_boxes], pyarrow.float32()),
+        "page_width": pyarrow.array([box["page_width"] for box in segment_boxes], pyarrow.int32()),
+        "page_height": pyarrow.array([box["page_height"] for box in segment_boxes], pyarrow.int32()),
+        "type": pyarrow.DictionaryArray.from_arrays(
+            pyarrow.array([type_indexes[box["type"]] for box in segment_boxes], pyarrow.int8()),
+            pyarrow.array(TYPES_VALUES, pyarrow.string()),
+        ),
+        "text": pyarrow.array([box["text"] for box in segment_boxes], pyarrow.string()),
+    }
+    if file_names is not None:
+        columns = {"file_name": pyarrow.array(file_names, pyarrow.string()).dictionary_encode(), **columns}
+    return pyarrow.table(columns)
+
+
+def get_segments_table_bytes(segment_boxes: list[dict], output_format: str, file_names: list[str] | None = None) -> bytes:
+    if output_format not in SEGMENTS_TABLE_MEDIA_TYPES:
+        raise ValueError(f"Unknown output format {output_format}, use json, arrow or parquet")
+
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    table = get_segments_table(segment_boxes, file_names)
+    sink = pyarrow.BufferOutputStream()
+    if output_format == "parquet":
+        pyarrow.parquet.write_table(table, sink)
+    else:
+        with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def get_batch_segments_table_bytes(batch_results: list[dict], output_format: str) -> bytes:
+    segment_boxes = [segment_box for result in batch_results for segment_box in result["segments"]]
+    file_names = [result["file_name"] for result in batch_results for _ in result["segments"]]
+    return get_segments_table_bytes(segment_boxes, output_format, file_names)
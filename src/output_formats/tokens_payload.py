@@ -0,0 +1,38 @@
+import numpy as np
+
+from ..pdf_features.PdfFeatures import PdfFeatures
+from ..pdf_token_type_labels.TokenType import TokenType
+
+
+def get_tokens_payload(pdf_features: PdfFeatures, probabilities: np.ndarray) -> dict:
+    """Column oriented tokens, fonts and pages. probabilities has a row per token in document order"""
+    tokens = [token for page in pdf_features.pages for token in page.tokens]
+    fonts = list({token.font.font_id: token.font for token in tokens}.values())
+    font_indexes = {font.font_id: index for index, font in enumerate(fonts)}
+    boxes = [token.bounding_box for token in tokens]
+    return {
+        "types": [token_type.value for token_type in TokenType],
+        "pages": {
+            "page_number": [page.page_number for page in pdf_features.pages],
+            "page_width": [page.page_width for page in pdf_features.pages],
+            "page_height": [page.page_height for page in pdf_features.pages],
+        },
+        "fonts": {
+            "font_id": [font.font_id for font in fonts],
+            "font_size": [font.font_size for font in fonts],
+            "bold": [font.bold for font in fonts],
+            "italics": [font.italics for font in fonts],
+            "color": [font.color for font in fonts],
+        },
+        "tokens": {
+            "page_number": [token.page_number for token in tokens],
+            "left": [box.left for box in boxes],
+            "top": [box.top for box in boxes],
+            "width": [box.width for box in boxes],
+            "height": [box.height for box in boxes],
+            "content": [token.content for token in tokens],
+            "font": [font_indexes[token.font.font_id] for token in tokens],
+            "type": [token.prediction for token in tokens],
+            "probabilities": np.round(probabilities, 4).tolist() if len(probabilities) == len(tokens) else [],
+        },
+    }
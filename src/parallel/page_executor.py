@@ -0,0 +1,164 @@
+import atexit
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from ..configuration import PAGE_WORKERS, PAGE_WORKERS_MIN_PAGES, service_logger
+from ..pdf_features.PdfFont import PdfFont
+from ..pdf_features.PdfPage import PdfPage
+from ..pdf_features.PdfToken import PdfToken
+from ..pdf_features.PdfTokenContext import PdfTokenContext
+from ..pdf_features.Rectangle import Rectangle
+from ..pdf_token_type_labels.TokenType import TokenType
+
+TOKEN_TYPES = list(TokenType)
+
+_executor: ProcessPoolExecutor | None = None
+_workers: int = PAGE_WORKERS if PAGE_WORKERS > 0 else len(os.sched_getaffinity(0))
+
+
+def set_page_workers(workers: int):
+    global _workers
+    _workers = max(1, workers)
+    shutdown_executor()
+
+
+def shutdown_executor():
+    global _executor
+    if _executor:
+        _executor.shutdown(cancel_futures=True)
+    _executor = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        service_logger.info(f"Starting page executor with {_workers} processes")
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        _executor = ProcessPoolExecutor(max_workers=_workers, mp_context=context)
+    return _executor
+
+
+def map_payloads(function, payloads: list) -> list:
+    """Runs function on each payload, in a process pool for large documents. Results keep the payloads order"""
+    if _workers < 2 or len(payloads) < PAGE_WORKERS_MIN_PAGES:
+        return [function(payload) for payload in payloads]
+
+    chunk_size = max(1, len(payloads) // (_workers * 4))
+    try:
+        return list(get_executor().map(function, payloads, chunksize=chunk_size))
+    except BrokenProcessPool:
+        service_logger.error("Page executor crashed, processing the pages serially")
+        shutdown_executor()
+        return [function(payload) for payload in payloads]
+
+
+def map_pages(function, pages: list[PdfPage], *pages_arguments: list) -> list:
+    """Calls function(page, *page_arguments) for each page. Pages cross to the workers as arrays"""
+    if _workers < 2 or len(pages) < PAGE_WORKERS_MIN_PAGES:
+        return [function(page, *arguments) for page, *arguments in zip(pages, *pages_arguments)]
+
+    payloads = [(function, get_page_payload(page), arguments) for page, *arguments in zip(pages, *pages_arguments)]
+    return map_payloads(run_on_page_payload, payloads)
+
+
+def run_on_page_payload(payload):
+    function, page_payload, arguments = payload
+    return function(get_page_from_payload(page_payload), *arguments)
+
+
+def get_page_payload(page: PdfPage) -> dict:
+    fonts = list({token.font.font_id: token.font for token in page.tokens}.values())
+    font_indexes = {font.font_id: index for index, font in enumerate(fonts)}
+    return {
+        "page": (page.page_number, page.page_width, page.page_height, page.pdf_name),
+        "fonts": [(font.font_id, font.font_size, font.bold, font.italics, font.color) for font in fonts],
+        "ids": [token.id for token in page.tokens],
+        "contents": [token.content for token in page.tokens],
+        "boxes": np.array(
+            [
+                [
+                    token.bounding_box.left,
+                    token.bounding_box.top,
+                    token.bounding_box.right,
+                    token.bounding_box.bottom,
+                    token.bounding_box.width,
+                    token.bounding_box.height,
+                ]
+                for token in page.tokens
+            ],
+            dtype=np.int64,
+        ).reshape(-1, 6),
+        "contexts": np.array(
+            [
+                [
+                    token.pdf_token_context.right_of_token_on_the_left,
+                    token.pdf_token_context.left_of_token_on_the_left,
+                    token.pdf_token_context.left_of_token_on_the_right,
+                    token.pdf_token_context.right_of_token_on_the_right,
+                ]
+                for token in page.tokens
+            ],
+            dtype=np.float64,
+        ).reshape(-1, 4),
+        "integers": np.array(
+            [
+                [
+                    font_indexes[token.font.font_id],
+                    token.reading_order_no,
+                    TOKEN_TYPES.index(token.token_type),
+                    token.prediction,
+                ]
+                for token in page.tokens
+            ],
+            dtype=np.int64,
+        ).reshape(-1, 4),
+    }
+
+
+def get_page_from_payload(payload: dict) -> PdfPage:
+    page_number, page_width, page_height, pdf_name = payload["page"]
+    fonts = [
+        PdfFont.model_construct(font_id=font_id, font_size=font_size, bold=bold, italics=italics, color=color)
+        for font_id, font_size, bold, italics, color in payload["fonts"]
+    ]
+    tokens = []
+    for token_id, content, box, context, integers in zip(
+        payload["ids"],
+        payload["contents"],
+        payload["boxes"].tolist(),
+        payload["contexts"].tolist(),
+        payload["integers"].tolist(),
+    ):
+        left, top, right, bottom, width, height = box
+        font_index, reading_order_no, token_type_index, prediction = integers
+        tokens.append(
+            PdfToken.model_construct(
+                page_number=page_number,
+                id=token_id,
+                content=content,
+                font=fonts[font_index],
+                reading_order_no=reading_order_no,
+                bounding_box=Rectangle.model_construct(
+                    left=left, top=top, right=right, bottom=bottom, width=width, height=height
+                ),
+                token_type=TOKEN_TYPES[token_type_index],
+                pdf_token_context=PdfTokenContext.model_construct(
+                    right_of_token_on_the_left=context[0],
+                    left_of_token_on_the_left=context[1],
+                    left_of_token_on_the_right=context[2],
+                    right_of_token_on_the_right=context[3],
+                ),
+                prediction=prediction,
+            )
+        )
+    return PdfPage.model_construct(
+        page_number=page_number, page_width=page_width, page_height=page_height, tokens=tokens, pdf_name=pdf_name
+    )
+
+
+atexit.register(shutdown_executor)
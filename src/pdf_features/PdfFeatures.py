@@ -2,15 +2,19 @@ import json
 import os
 import subprocess
 import tempfile
+import uuid
 from collections import Counter
 from os.path import join, exists
 from pathlib import Path
 from statistics import mode
 from subprocess import CalledProcessError
+import numpy as np
 from lxml import etree
 from lxml.etree import ElementBase, XMLSyntaxError
 from pydantic import BaseModel
 
+from ..metrics.pipeline_metrics import timed_stage
+from ..parallel.page_executor import map_payloads
 from ..pdf_features.PdfFont import PdfFont
 from ..pdf_features.PdfModes import PdfModes
 from ..pdf_features.PdfPage import PdfPage
@@ -31,10 +35,12 @@ class PdfFeatures(BaseModel):
     file_type: str
     pdf_modes: PdfModes = PdfModes()
 
+    @timed_stage("context")
     def model_post_init(self, ctx):
-        self.get_modes()
+        pages_layouts = map_payloads(PdfFeatures.get_page_layout, [PdfFeatures.get_page_boxes(page) for page in self.pages])
+        self.get_modes(pages_layouts)
         self.get_mode_font()
-        self.get_tokens_context()
+        self.get_tokens_context(pages_layouts)
 
     def loop_tokens(self):
         for page in self.pages:
@@ -58,6 +64,7 @@ class PdfFeatures(BaseModel):
         return PdfFeatures.from_poppler_etree_content(file_path, file_content, file_name, dataset)
 
     @staticmethod
+    @timed_stage("xml_parse")
     def from_poppler_etree_content(
         file_path: str | Path, file_content: str, file_name: str | None = None, dataset: str | None = None
     ):
@@ -100,6 +107,24 @@ class PdfFeatures(BaseModel):
             return False
         return len(text_elements) > 0
 
+    @staticmethod
+    def get_pages_without_text(xml_path: str) -> list[int] | None:
+        try:
+            file_content = open(xml_path).read()
+            file_bytes = file_content.encode("utf-8")
+            root: ElementBase = etree.fromstring(file_bytes, parser=etree.XMLParser(recover=True, encoding="utf-8"))
+        except (FileNotFoundError, UnicodeDecodeError, XMLSyntaxError):
+            return None
+
+        if root is None:
+            return None
+
+        return [
+            int(page.attrib["number"])
+            for page in root.findall(".//page")
+            if not any("".join(text.itertext()).strip() for text in page.findall(".//text"))
+        ]
+
     @staticmethod
     def is_pdf_encrypted(pdf_path):
         try:
@@ -111,15 +136,16 @@ class PdfFeatures(BaseModel):
     @staticmethod
     def from_pdf_path(pdf_path, xml_path: str | Path = None):
         remove_xml = False if xml_path else True
-        xml_path = str(xml_path) if xml_path else join(tempfile.gettempdir(), "pdf_etree.xml")
+        xml_path = str(xml_path) if xml_path else join(tempfile.gettempdir(), f"pdf_etree_{uuid.uuid1()}.xml")
 
         if PdfFeatures.is_pdf_encrypted(pdf_path):
             subprocess.run(["qpdf", "--decrypt", "--replace-input", pdf_path])
 
-        subprocess.run(["pdftohtml", "-nodrm", "-i", "-xml", "-zoom", "1.0", pdf_path, xml_path])
+        with timed_stage("pdftohtml"):
+            subprocess.run(["pdftohtml", "-nodrm", "-i", "-xml", "-zoom", "1.0", pdf_path, xml_path])
 
-        if not PdfFeatures.contains_text(xml_path):
-            subprocess.run(["pdftohtml", "-nodrm", "-i", "-hidden", "-xml", "-zoom", "1.0", pdf_path, xml_path])
+            if not PdfFeatures.contains_text(xml_path):
+                subprocess.run(["pdftohtml", "-nodrm", "-i", "-hidden", "-xml", "-zoom", "1.0", pdf_path, xml_path])
 
         pdf_features = PdfFeatures.from_poppler_etree(xml_path, file_name=Path(pdf_path).name)
 
@@ -149,26 +175,52 @@ class PdfFeatures(BaseModel):
         labels_dict = json.loads(labels_text)
         return PdfLabels(**labels_dict)
 
-    def get_modes(self):
-        line_spaces, right_spaces = [0], [0]
-
-        for page, token in self.loop_tokens():
-            top, bottom = token.bounding_box.top, token.bounding_box.bottom
-            left, right = token.bounding_box.left, token.bounding_box.right
-
-            on_the_bottom = [page_token for page_token in page.tokens if bottom < page_token.bounding_box.top]
-
-            on_the_right = [
-                line_token
-                for line_token in PdfToken.get_same_line_tokens(token, page.tokens)
-                if right < line_token.bounding_box.left
-            ]
-
-            if len(on_the_bottom):
-                line_spaces.append(min(map(lambda x: int(x.bounding_box.top - bottom), on_the_bottom)))
+    @staticmethod
+    def get_page_boxes(page: PdfPage) -> np.ndarray:
+        boxes = [
+            [token.bounding_box.left, token.bounding_box.top, token.bounding_box.right, token.bounding_box.bottom]
+            for token in page.tokens
+        ]
+        return np.array(boxes, dtype=np.int64).reshape(-1, 4)
 
-            if not on_the_right:
-                right_spaces.append(int(right))
+    @staticmethod
+    def get_page_layout(boxes: np.ndarray, block_size: int = 256):
+        """Line spaces, right spaces and same line context of every token of a page, vectorized by blocks of tokens"""
+        lefts, tops, rights, bottoms = boxes.T
+        line_spaces, right_spaces, contexts = [], [], np.zeros((len(boxes), 4), dtype=np.int64)
+        for start in range(0, len(boxes), block_size):
+            block = slice(start, start + block_size)
+            left, top, right, bottom = lefts[block, None], tops[block, None], rights[block, None], bottoms[block, None]
+            height = bottom - top
+
+            on_the_bottom = bottom < tops
+            line_space = np.where(on_the_bottom, tops - bottom, np.iinfo(np.int64).max).min(axis=1)
+            line_spaces.append(line_space[on_the_bottom.any(axis=1)])
+
+            same_line = ((top <= tops) & (tops < top + height)) | ((top < bottoms) & (bottoms <= top + height))
+            no_token_on_the_right = ~(same_line & (right < lefts)).any(axis=1)
+            right_spaces.append(rights[block][no_token_on_the_right])
+
+            on_the_left = same_line & (rights < right)
+            on_the_right = same_line & (left < lefts)
+            has_left, has_right = on_the_left.any(axis=1), on_the_right.any(axis=1)
+            contexts[block, 0] = np.where(has_left, np.where(on_the_left, rights, np.iinfo(np.int64).min).max(axis=1), 0)
+            contexts[block, 1] = np.where(
+                has_left, np.where(on_the_left, lefts, np.iinfo(np.int64).max).min(axis=1), lefts[block]
+            )
+            contexts[block, 2] = np.where(has_right, np.where(on_the_right, lefts, np.iinfo(np.int64).max).min(axis=1), 0)
+            contexts[block, 3] = np.where(has_right, np.where(on_the_right, rights, np.iinfo(np.int64).min).max(axis=1), 0)
+
+        if not len(boxes):
+            return [], [], contexts
+
+        return np.concatenate(line_spaces).tolist(), np.concatenate(right_spaces).tolist(), contexts
+
+    def get_modes(self, pages_layouts: list):
+        line_spaces, right_spaces = [0], [0]
+        for page_line_spaces, page_right_spaces, _ in pages_layouts:
+            line_spaces.extend(page_line_spaces)
+            right_spaces.extend(page_right_spaces)
 
         self.pdf_modes.lines_space_mode = mode(line_spaces)
         self.pdf_modes.right_space_mode = int(self.pages[0].page_width - mode(right_spaces)) if self.pages else 0
@@ -186,9 +238,13 @@ class PdfFeatures(BaseModel):
         if font_mode_token:
             self.pdf_modes.font_size_mode = float(font_mode_token[0].font_size)
 
-    def get_tokens_context(self):
-        for page, token in self.loop_tokens():
-            token.get_context(page.tokens)
+    def get_tokens_context(self, pages_layouts: list):
+        for page, (_, _, contexts) in zip(self.pages, pages_layouts):
+            for token, context in zip(page.tokens, contexts.tolist()):
+                token.pdf_token_context.right_of_token_on_the_left = context[0]
+                token.pdf_token_context.left_of_token_on_the_left = context[1]
+                token.pdf_token_context.left_of_token_on_the_right = context[2]
+                token.pdf_token_context.right_of_token_on_the_right = context[3]
 
     @staticmethod
     def get_empty():
@@ -0,0 +1,56 @@
+import zipfile
+from io import BytesIO
+from pathlib import Path
+
+from ..configuration import BATCH_MAX_DOCUMENTS, VGT_QUANTIZED, service_logger
+from ..pdf_layout_analysis.run_pdf_layout_analysis import analyze_pdfs
+from ..pdf_layout_analysis.run_pdf_layout_analysis_auto import analyze_pdfs_auto
+from ..pdf_layout_analysis.run_pdf_layout_analysis_fast import analyze_pdfs_fast
+
+
+def get_zip_documents(zip_content: bytes) -> list[tuple[str, bytes]]:
+    documents = []
+    with zipfile.ZipFile(BytesIO(zip_content)) as zip_file:
+        for member in sorted(zip_file.infolist(), key=lambda info: info.filename):
+            path = Path(member.filename)
+            if member.is_dir() or path.suffix.lower() != ".pdf" or "__MACOSX" in path.parts:
+                continue
+            documents.append((member.filename, zip_file.read(member)))
+    return documents
+
+
+def get_batch_documents(uploads: list[tuple[str, bytes]]) -> list[tuple[str, bytes]]:
+    """Returns the (file name, content) of every uploaded PDF, zip files are expanded to the PDFs they contain"""
+    documents = []
+    for file_name, content in uploads:
+        if zipfile.is_zipfile(BytesIO(content)):
+            documents.extend(get_zip_documents(content))
+        else:
+            documents.append((file_name, content))
+
+    if not documents:
+        raise ValueError("No PDF files in the batch")
+    if len(documents) > BATCH_MAX_DOCUMENTS:
+        raise ValueError(f"The batch has {len(documents)} PDF files, the limit is {BATCH_MAX_DOCUMENTS}")
+    return documents
+
+
+def analyze_batch(
+    uploads: list[tuple[str, bytes]],
+    fast: bool = False,
+    extraction_format: str = "",
+    ocr: bool = False,
+    language: str = "en",
+    quantized: bool = VGT_QUANTIZED,
+    mode: str = "",
+) -> list[dict]:
+    documents = get_batch_documents(uploads)
+    service_logger.info(f"Analyzing a batch of {len(documents)} PDF files")
+    contents = [content for _, content in documents]
+    if mode == "auto":
+        results = analyze_pdfs_auto(contents, extraction_format, ocr, language, quantized)
+    elif fast:
+        results = analyze_pdfs_fast(contents, extraction_format, ocr, language)
+    else:
+        results = analyze_pdfs(contents, extraction_format, ocr, language, quantized)
+    return [{"file_name": file_name, "segments": segments} for (file_name, _), segments in zip(documents, results)]
@@ -0,0 +1,50 @@
+import gc
+import os
+import sys
+from os.path import join
+
+from ..configuration import MODELS_PATH, PRELOAD_VGT, VGT_QUANTIZED, service_logger
+from ..parallel.page_executor import set_page_workers
+from ..pdf_layout_analysis import run_pdf_layout_analysis
+from ..pdf_tokens_type_trainer.PdfTrainer import PdfTrainer
+from ..vgt.create_word_grid import get_tokenizer
+
+LIGHTGBM_MODELS = ["token_type_lightgbm.model", "paragraph_extraction_lightgbm.model"]
+
+
+def preload_models():
+    """Load the models once in the parent process so forked workers share their memory"""
+    for model_name in LIGHTGBM_MODELS:
+        PdfTrainer.get_lightgbm_model(join(MODELS_PATH, model_name))
+
+    if PRELOAD_VGT:
+        preload_vgt_model()
+
+    gc.collect()
+    gc.freeze()
+    service_logger.info("Models preloaded")
+
+
+def preload_vgt_model():
+    """Imports torch, detectron2 and transformers, and loads VGT and the word grid tokenizer"""
+    import torch
+
+    get_tokenizer()
+    if torch.cuda.is_available():
+        service_logger.info("CUDA can not be shared across forked workers, every worker loads its own VGT model")
+        return
+
+    model, _ = run_pdf_layout_analysis.get_model_and_config(VGT_QUANTIZED)
+    model.eval()
+    model.share_memory()
+
+
+def set_worker_threads(workers: int):
+    """torch reads OMP_NUM_THREADS when it is imported, if it was not preloaded"""
+    threads = max(1, len(os.sched_getaffinity(0)) // workers)
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
+    else:
+        os.environ["OMP_NUM_THREADS"] = str(threads)
+    set_page_workers(threads)
+    service_logger.info(f"Using {threads} torch threads per worker")
@@ -1,39 +1,98 @@
+import fcntl
 import tempfile
+import threading
 import uuid
+from contextlib import contextmanager
+from os import makedirs
 from os.path import join
 from pathlib import Path
 from typing import AnyStr
+from ..cache.page_results_cache import get_pages_fingerprints, get_vgt_context, get_cached_segments, get_pages_view
+from ..cache.page_results_cache import store_segments, merge_segments
+from ..cache.vgt_predictions_cache import get_predictions_keys, get_cached_predictions
+from ..data_model.Prediction import Prediction
 from ..data_model.SegmentBox import SegmentBox
-from ..ditod.VGTTrainer import VGTTrainer
 from ..extraction_formats.extract_formula_formats import extract_formula_format
 from ..extraction_formats.extract_table_formats import extract_table_format
 from ..vgt.get_json_annotations import get_annotations
-from ..vgt.get_model_configuration import get_model_configuration
 from ..vgt.get_most_probable_pdf_segments import get_most_probable_pdf_segments
 from ..vgt.get_reading_orders import get_reading_orders
+from ..vgt.page_router import get_routed_segments
 from ..data_model.PdfImages import PdfImages
-from ..configuration import service_logger, JSON_TEST_FILE_PATH, IMAGES_ROOT_PATH
+from ..fast_trainer.PdfSegment import PdfSegment
+from ..configuration import service_logger, JSON_TEST_FILE_PATH, IMAGES_ROOT_PATH, JSONS_ROOT_PATH, VGT_QUANTIZED
+from ..configuration import VGT_EXPORTED_BACKBONE, VGT_PRECISION, VGT_PAGE_ROUTER
+from ..metrics.pipeline_metrics import timed_stage, count_pages_and_tokens, count_segments, set_torch_model_memory
 from ..vgt.create_word_grid import create_word_grid, remove_word_grids
-from detectron2.checkpoint import DetectionCheckpointer
-from detectron2.data.datasets import register_coco_instances
-from detectron2.data import DatasetCatalog
+from ..ocr.ocr_pdf import ocr_pdf_in_place
 
-# Global variables for lazy loading
+# Global variables for lazy loading, detectron2 and torch are only imported with the model
 _model = None
+_quantized_model = None
 _configuration = None
+_model_lock = threading.Lock()
 
-def get_model_and_config():
+def get_configuration():
+    from ..vgt.get_model_configuration import get_model_configuration
+
+    global _configuration
+    with _model_lock:
+        if _configuration is None:
+            _configuration = get_model_configuration()
+    return _configuration
+
+def use_quantized_model(quantized: bool) -> bool:
+    """Dynamic quantization only runs on CPU, with a GPU the FP32 model is used"""
+    return quantized and get_configuration().MODEL.DEVICE == "cpu"
+
+def get_inference_precision(quantized: bool = False) -> str:
+    """fp32, bf16 or fp16 autocast of the VGT backbone. fp16 only on GPU, the quantized model always runs in fp32"""
+    if VGT_PRECISION not in ["fp32", "bf16", "fp16"]:
+        raise ValueError(f"Unknown VGT_PRECISION {VGT_PRECISION}, use fp32, bf16 or fp16")
+    if quantized:
+        return "fp32"
+    if VGT_PRECISION == "fp16" and get_configuration().MODEL.DEVICE != "cuda":
+        service_logger.info("fp16 autocast needs a GPU, running VGT in fp32")
+        return "fp32"
+    return VGT_PRECISION
+
+def get_model_and_config(quantized: bool = False):
     """Lazy load the model and configuration when first needed"""
-    global _model, _configuration
-    if _model is None:
-        service_logger.info("Loading VGT model and configuration...")
-        _configuration = get_model_configuration()
-        _model = VGTTrainer.build_model(_configuration)
-        DetectionCheckpointer(_model, save_dir=_configuration.OUTPUT_DIR).resume_or_load(
-            _configuration.MODEL.WEIGHTS, resume=True
-        )
-        service_logger.info("VGT model loaded successfully")
-    return _model, _configuration
+    from ..ditod.VGTTrainer import VGTTrainer
+    from ..vgt.export_backbone import use_exported_backbone
+    from ..vgt.quantize_model import get_quantized_model
+    from ..vgt.safetensors_weights import load_vgt_weights
+
+    global _model, _quantized_model
+    configuration = get_configuration()
+    with _model_lock:
+        if quantized and _quantized_model is None:
+            service_logger.info("Loading INT8 quantized VGT model...")
+            _quantized_model = get_quantized_model(configuration)
+            set_torch_model_memory("vgt_int8", _quantized_model)
+            service_logger.info("Quantized VGT model loaded successfully")
+        if not quantized and _model is None:
+            service_logger.info("Loading VGT model and configuration...")
+            model = VGTTrainer.build_model(configuration)
+            load_vgt_weights(model, configuration)
+            if VGT_EXPORTED_BACKBONE:
+                use_exported_backbone(model)
+            model.inference_precision = get_inference_precision()
+            set_torch_model_memory("vgt", model)
+            _model = model
+            service_logger.info("VGT model loaded successfully")
+    return _quantized_model if quantized else _model, configuration
+
+@contextmanager
+def vgt_scratch_lock():
+    """The word grids, the COCO json and the model output folder are shared by every worker process"""
+    makedirs(JSONS_ROOT_PATH, exist_ok=True)
+    with open(Path(JSONS_ROOT_PATH, ".vgt.lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
 
 def get_file_path(file_name, extension):
     return join(tempfile.gettempdir(), file_name + "." + extension)
@@ -47,6 +106,9 @@ def pdf_content_to_pdf_path(file_content):
     return pdf_path
 
 def register_data():
+    from detectron2.data import DatasetCatalog
+    from detectron2.data.datasets import register_coco_instances
+
     try:
         DatasetCatalog.remove("predict_data")
     except KeyError:
@@ -54,33 +116,130 @@ def register_data():
 
     register_coco_instances("predict_data", {}, JSON_TEST_FILE_PATH, IMAGES_ROOT_PATH)
 
-def predict_doclaynet():
-    model, configuration = get_model_and_config()  # Get model lazily
+@timed_stage("vgt_forward")
+def predict_doclaynet(quantized: bool = False):
+    from ..ditod.VGTTrainer import VGTTrainer
+
+    model, configuration = get_model_and_config(quantized)  # Get model lazily
     register_data()
     VGTTrainer.test(configuration, model)
 
-def analyze_pdf(file: AnyStr, xml_file_name: str, extraction_format: str = "", keep_pdf: bool = False) -> list[dict]:
+def analyze_pdf(
+    file: AnyStr,
+    xml_file_name: str,
+    extraction_format: str = "",
+    keep_pdf: bool = False,
+    ocr: bool = False,
+    language: str = "en",
+    quantized: bool = VGT_QUANTIZED,
+) -> list[dict]:
     pdf_path = pdf_content_to_pdf_path(file)
+    return analyze_pdf_paths([pdf_path], [xml_file_name], extraction_format, keep_pdf, ocr, language, quantized)[0]
+
+def analyze_pdfs(
+    files: list[AnyStr], extraction_format: str = "", ocr: bool = False, language: str = "en", quantized: bool = VGT_QUANTIZED
+) -> list[list[dict]]:
+    """Analyzes several PDFs at once, the word grid, VGT and reading order stages run once for the whole batch"""
+    pdf_paths = [pdf_content_to_pdf_path(file) for file in files]
+    return analyze_pdf_paths(pdf_paths, ["" for _ in pdf_paths], extraction_format, False, ocr, language, quantized)
+
+def analyze_pdf_paths(
+    pdf_paths: list[Path],
+    xml_file_names: list[str],
+    extraction_format: str = "",
+    keep_pdf: bool = False,
+    ocr: bool = False,
+    language: str = "en",
+    quantized: bool = VGT_QUANTIZED,
+) -> list[list[dict]]:
+    quantized = use_quantized_model(quantized)
+    if ocr:
+        for pdf_path in pdf_paths:
+            ocr_pdf_in_place(pdf_path, language)
     service_logger.info("Creating PDF images")
-    pdf_images_list: list[PdfImages] = [PdfImages.from_pdf_path(pdf_path, "", xml_file_name)]
-    create_word_grid([pdf_images.pdf_features for pdf_images in pdf_images_list])
-    get_annotations(pdf_images_list)
-    predict_doclaynet()
-    remove_files()
-    predicted_segments = get_most_probable_pdf_segments("doclaynet", pdf_images_list, False)
-    predicted_segments = get_reading_orders(pdf_images_list, predicted_segments)
-    extract_formula_format(pdf_images_list[0], predicted_segments)
-    if extraction_format:
-        extract_table_format(pdf_images_list[0], predicted_segments, extraction_format)
-
-    if not keep_pdf:
-        pdf_path.unlink(missing_ok=True)
-
-    return [
-        SegmentBox.from_pdf_segment(pdf_segment, pdf_images_list[0].pdf_features.pages).to_dict()
-        for pdf_segment in predicted_segments
+    pdf_images_list: list[PdfImages] = [
+        PdfImages.from_pdf_path(pdf_path, "", xml_file_name) for pdf_path, xml_file_name in zip(pdf_paths, xml_file_names)
     ]
+    for pdf_images in pdf_images_list:
+        count_pages_and_tokens(pdf_images.pdf_features, "vgt")
+    segments_list = get_vgt_segments(pdf_images_list, quantized)
+
+    results = []
+    for pdf_path, pdf_images, segments in zip(pdf_paths, pdf_images_list, segments_list):
+        if extraction_format:
+            extract_table_format(pdf_images, segments, extraction_format)
+
+        if not keep_pdf:
+            pdf_path.unlink(missing_ok=True)
+
+        count_segments(segments, "vgt")
+        results.append(SegmentBox.get_segments_dicts(segments, pdf_images.pdf_features.pages))
+    return results
+
+def get_vgt_segments(
+    pdf_images_list: list[PdfImages], quantized: bool, excluded_pages_list: list[set[int]] | None = None
+) -> list[list[PdfSegment]]:
+    """Segments of the pages not excluded, from the page results cache, the page router or VGT. Removes the page images"""
+    excluded_pages_list = excluded_pages_list or [set() for _ in pdf_images_list]
+    vgt_context = get_vgt_context(quantized, get_inference_precision(quantized))
+    pages_fingerprints_list = [
+        {
+            page_number: fingerprint
+            for page_number, fingerprint in get_pages_fingerprints(pdf_images, vgt_context).items()
+            if page_number not in excluded_pages
+        }
+        for pdf_images, excluded_pages in zip(pdf_images_list, excluded_pages_list)
+    ]
+    cached_segments_list = [
+        get_cached_segments(pdf_images, pages_fingerprints)
+        for pdf_images, pages_fingerprints in zip(pdf_images_list, pages_fingerprints_list)
+    ]
+    routed_segments_list = [
+        get_routed_segments(pdf_images, set(cached_segments) | excluded_pages) if VGT_PAGE_ROUTER else {}
+        for pdf_images, cached_segments, excluded_pages in zip(pdf_images_list, cached_segments_list, excluded_pages_list)
+    ]
+    pages_views = [
+        get_pages_view(pdf_images, {*cached, *routed, *excluded_pages})
+        for pdf_images, cached, routed, excluded_pages in zip(
+            pdf_images_list, cached_segments_list, routed_segments_list, excluded_pages_list
+        )
+    ]
+    views_to_predict = [pages_view for pages_view in pages_views if pages_view.pdf_features.pages]
+    predicted_segments = []
+    with vgt_scratch_lock():
+        if views_to_predict:
+            create_word_grid([pages_view.pdf_features for pages_view in views_to_predict])
+            predictions_keys = get_predictions_keys(views_to_predict, vgt_context)
+            cached_predictions = get_cached_predictions(predictions_keys)
+            model_views = [get_model_pages_view(pages_view, cached_predictions) for pages_view in views_to_predict]
+            model_views = [model_view for model_view in model_views if model_view.pdf_features.pages]
+            if model_views:
+                get_annotations(model_views)
+                predict_doclaynet(quantized)
+        remove_files(pdf_images_list)
+        if views_to_predict:
+            predicted_segments = get_most_probable_pdf_segments(
+                "doclaynet", views_to_predict, False, cached_predictions, predictions_keys
+            )
+    predicted_segments = get_reading_orders(views_to_predict, predicted_segments)
+
+    segments_list = []
+    for pdf_images, pages_view, pages_fingerprints, cached_segments, routed_segments in zip(
+        pdf_images_list, pages_views, pages_fingerprints_list, cached_segments_list, routed_segments_list
+    ):
+        new_segments = [segment for segment in predicted_segments if segment.pdf_name == pdf_images.pdf_features.file_name]
+        extract_formula_format(pdf_images, new_segments)
+        store_segments(pages_fingerprints, [page.page_number for page in pages_view.pdf_features.pages], new_segments)
+        segments_list.append(merge_segments(pdf_images, {**cached_segments, **routed_segments}, new_segments))
+    return segments_list
+
+def get_model_pages_view(pdf_images: PdfImages, cached_predictions: dict[str, list[Prediction]]) -> PdfImages:
+    file_name = pdf_images.pdf_features.file_name
+    pages = pdf_images.pdf_features.pages
+    cached_pages = {page.page_number for page in pages if f"{file_name}_{page.page_number - 1}" in cached_predictions}
+    return get_pages_view(pdf_images, cached_pages)
 
-def remove_files():
-    PdfImages.remove_images()
+def remove_files(pdf_images_list: list[PdfImages]):
+    for pdf_images in pdf_images_list:
+        pdf_images.remove_images()
     remove_word_grids()
@@ -0,0 +1,127 @@
+from os.path import join
+from pathlib import Path
+from typing import AnyStr
+
+import numpy as np
+
+from ..cache.page_results_cache import get_pages_view, merge_segments
+from ..configuration import AUTO_MIN_PAGE_CONFIDENCE, MODELS_PATH, VGT_QUANTIZED, service_logger
+from ..data_model.PdfImages import PdfImages
+from ..data_model.SegmentBox import SegmentBox
+from ..extraction_formats.extract_formula_formats import extract_formula_format
+from ..extraction_formats.extract_table_formats import extract_table_format
+from ..fast_trainer.ParagraphExtractorTrainer import ParagraphExtractorTrainer
+from ..fast_trainer.PdfSegment import PdfSegment
+from ..fast_trainer.model_configuration import MODEL_CONFIGURATION as PARAGRAPH_EXTRACTION_CONFIGURATION
+from ..metrics.pipeline_metrics import count_pages_and_tokens, count_segments
+from ..ocr.ocr_pdf import ocr_pdf_in_place
+from ..pdf_features.PdfFeatures import PdfFeatures
+from ..pdf_layout_analysis.run_pdf_layout_analysis import get_vgt_segments, pdf_content_to_pdf_path, use_quantized_model
+from ..pdf_token_type_labels.TokenType import TokenType
+from ..pdf_tokens_type_trainer.ModelConfiguration import ModelConfiguration
+from ..pdf_tokens_type_trainer.TokenTypeTrainer import TokenTypeTrainer
+
+
+def analyze_pdf_auto(
+    file: AnyStr,
+    xml_file_name: str = "",
+    extraction_format: str = "",
+    keep_pdf: bool = False,
+    ocr: bool = False,
+    language: str = "en",
+    quantized: bool = VGT_QUANTIZED,
+) -> list[dict]:
+    pdf_path = pdf_content_to_pdf_path(file)
+    return analyze_pdf_paths_auto([pdf_path], [xml_file_name], extraction_format, keep_pdf, ocr, language, quantized)[0]
+
+
+def analyze_pdfs_auto(
+    files: list[AnyStr],
+    extraction_format: str = "",
+    ocr: bool = False,
+    language: str = "en",
+    quantized: bool = VGT_QUANTIZED,
+) -> list[list[dict]]:
+    pdf_paths = [pdf_content_to_pdf_path(file) for file in files]
+    return analyze_pdf_paths_auto(pdf_paths, ["" for _ in pdf_paths], extraction_format, False, ocr, language, quantized)
+
+
+def get_uncertain_pages(pdfs_features: list[PdfFeatures], probabilities: np.ndarray) -> list[set[int]]:
+    """Pages whose mean token type probability is under AUTO_MIN_PAGE_CONFIDENCE, with tables or without tokens.
+    probabilities has a row per token in document order"""
+    uncertain_pages_list = []
+    first_row = 0
+    for pdf_features in pdfs_features:
+        uncertain_pages = set()
+        for page in pdf_features.pages:
+            page_probabilities = probabilities[first_row : first_row + len(page.tokens)]
+            first_row += len(page.tokens)
+            has_tables = any(token.token_type == TokenType.TABLE for token in page.tokens)
+            if has_tables or not len(page_probabilities) or page_probabilities.max(axis=1).mean() < AUTO_MIN_PAGE_CONFIDENCE:
+                uncertain_pages.add(page.page_number)
+        uncertain_pages_list.append(uncertain_pages)
+    return uncertain_pages_list
+
+
+def get_fast_segments(pdf_paths: list[Path], fast_views: list[PdfImages]) -> list[list[PdfSegment]]:
+    pdfs_features = [fast_view.pdf_features for fast_view in fast_views if fast_view.pdf_features.pages]
+    all_segments = []
+    if pdfs_features:
+        trainer = ParagraphExtractorTrainer(
+            pdfs_features=pdfs_features, model_configuration=PARAGRAPH_EXTRACTION_CONFIGURATION
+        )
+        all_segments = trainer.get_pdf_segments(join(MODELS_PATH, "paragraph_extraction_lightgbm.model"))
+    return [[segment for segment in all_segments if segment.pdf_name == pdf_path.name] for pdf_path in pdf_paths]
+
+
+def analyze_pdf_paths_auto(
+    pdf_paths: list[Path],
+    xml_file_names: list[str],
+    extraction_format: str = "",
+    keep_pdf: bool = False,
+    ocr: bool = False,
+    language: str = "en",
+    quantized: bool = VGT_QUANTIZED,
+) -> list[list[dict]]:
+    """Runs the LightGBM models on every page and VGT only on the pages where the token types are uncertain"""
+    quantized = use_quantized_model(quantized)
+    if ocr:
+        for pdf_path in pdf_paths:
+            ocr_pdf_in_place(pdf_path, language)
+    service_logger.info("Creating PDF images [auto]")
+    pdf_images_list = [
+        PdfImages.from_pdf_path(pdf_path, "", xml_file_name) for pdf_path, xml_file_name in zip(pdf_paths, xml_file_names)
+    ]
+    pdfs_features = [pdf_images.pdf_features for pdf_images in pdf_images_list]
+    for pdf_features in pdfs_features:
+        count_pages_and_tokens(pdf_features, "auto")
+
+    token_type_trainer = TokenTypeTrainer(pdfs_features, ModelConfiguration())
+    token_type_trainer.set_token_types(join(MODELS_PATH, "token_type_lightgbm.model"))
+    uncertain_pages_list = get_uncertain_pages(pdfs_features, token_type_trainer.probabilities)
+    uncertain_pages_count = sum(len(uncertain_pages) for uncertain_pages in uncertain_pages_list)
+    pages_count = sum(len(pdf_features.pages) for pdf_features in pdfs_features)
+    service_logger.info(f"{uncertain_pages_count} of {pages_count} pages go to VGT [auto]")
+
+    fast_views = [get_pages_view(pdf_images, pages) for pdf_images, pages in zip(pdf_images_list, uncertain_pages_list)]
+    fast_segments_list = get_fast_segments(pdf_paths, fast_views)
+    certain_pages_list = [
+        {page.page_number for page in pdf_images.pdf_features.pages} - uncertain_pages
+        for pdf_images, uncertain_pages in zip(pdf_images_list, uncertain_pages_list)
+    ]
+    vgt_segments_list = get_vgt_segments(pdf_images_list, quantized, certain_pages_list)
+
+    results = []
+    for pdf_path, pdf_images, fast_segments, vgt_segments in zip(
+        pdf_paths, pdf_images_list, fast_segments_list, vgt_segments_list
+    ):
+        extract_formula_format(pdf_images, fast_segments)
+        segments = merge_segments(pdf_images, {}, vgt_segments + fast_segments)
+        if extraction_format:
+            extract_table_format(pdf_images, segments, extraction_format)
+
+        if not keep_pdf:
+            pdf_path.unlink(missing_ok=True)
+        count_segments(segments, "auto")
+        results.append(SegmentBox.get_segments_dicts(segments, pdf_images.pdf_features.pages))
+    return results
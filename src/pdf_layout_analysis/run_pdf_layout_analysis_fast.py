@@ -1,40 +1,115 @@
 from os.path import join
+from pathlib import Path
 from typing import AnyStr
 
+from ..cache.page_results_cache import get_pages_fingerprints, get_fast_context, get_cached_segments, get_pages_view
+from ..cache.page_results_cache import store_segments, merge_segments
 from ..data_model.PdfImages import PdfImages
 from ..extraction_formats.extract_formula_formats import extract_formula_format
 from ..extraction_formats.extract_table_formats import extract_table_format
 from ..fast_trainer.ParagraphExtractorTrainer import ParagraphExtractorTrainer
 from ..fast_trainer.model_configuration import MODEL_CONFIGURATION as PARAGRAPH_EXTRACTION_CONFIGURATION
+from ..output_formats.tokens_payload import get_tokens_payload
+from ..pdf_features.PdfFeatures import PdfFeatures
 from ..pdf_layout_analysis.run_pdf_layout_analysis import pdf_content_to_pdf_path
 from ..pdf_tokens_type_trainer.TokenTypeTrainer import TokenTypeTrainer
 from ..pdf_tokens_type_trainer.ModelConfiguration import ModelConfiguration
 
 from ..configuration import MODELS_PATH, service_logger
 from ..data_model.SegmentBox import SegmentBox
+from ..metrics.pipeline_metrics import count_pages_and_tokens, count_segments
+from ..ocr.ocr_pdf import ocr_pdf_in_place
 
 
 def analyze_pdf_fast(
-    file: AnyStr, xml_file_name: str = "", extraction_format: str = "", keep_pdf: bool = False
+    file: AnyStr,
+    xml_file_name: str = "",
+    extraction_format: str = "",
+    keep_pdf: bool = False,
+    ocr: bool = False,
+    language: str = "en",
 ) -> list[dict]:
     pdf_path = pdf_content_to_pdf_path(file)
+    return analyze_pdf_paths_fast([pdf_path], [xml_file_name], extraction_format, keep_pdf, ocr, language)[0]
+
+
+def analyze_pdfs_fast(
+    files: list[AnyStr], extraction_format: str = "", ocr: bool = False, language: str = "en"
+) -> list[list[dict]]:
+    """Analyzes several PDFs at once, the LightGBM models predict all the documents tokens together"""
+    pdf_paths = [pdf_content_to_pdf_path(file) for file in files]
+    return analyze_pdf_paths_fast(pdf_paths, ["" for _ in pdf_paths], extraction_format, False, ocr, language)
+
+
+def analyze_pdf_paths_fast(
+    pdf_paths: list[Path],
+    xml_file_names: list[str],
+    extraction_format: str = "",
+    keep_pdf: bool = False,
+    ocr: bool = False,
+    language: str = "en",
+) -> list[list[dict]]:
+    if ocr:
+        for pdf_path in pdf_paths:
+            ocr_pdf_in_place(pdf_path, language)
     service_logger.info("Creating Paragraph Tokens [fast]")
 
-    pdf_images = PdfImages.from_pdf_path(pdf_path=pdf_path, pdf_name="", xml_file_name=xml_file_name)
+    pdf_images_list = [
+        PdfImages.from_pdf_path(pdf_path=pdf_path, pdf_name="", xml_file_name=xml_file_name)
+        for pdf_path, xml_file_name in zip(pdf_paths, xml_file_names)
+    ]
+    for pdf_images in pdf_images_list:
+        count_pages_and_tokens(pdf_images.pdf_features, "fast")
 
-    token_type_trainer = TokenTypeTrainer([pdf_images.pdf_features], ModelConfiguration())
-    token_type_trainer.set_token_types(join(MODELS_PATH, "token_type_lightgbm.model"))
+    pages_fingerprints_list = [
+        get_pages_fingerprints(pdf_images, get_fast_context(pdf_images)) for pdf_images in pdf_images_list
+    ]
+    cached_segments_list = [
+        get_cached_segments(pdf_images, pages_fingerprints)
+        for pdf_images, pages_fingerprints in zip(pdf_images_list, pages_fingerprints_list)
+    ]
+    pages_views = [get_pages_view(pdf_images, cached) for pdf_images, cached in zip(pdf_images_list, cached_segments_list)]
+    pdfs_features = [pages_view.pdf_features for pages_view in pages_views if pages_view.pdf_features.pages]
+
+    all_segments = []
+    if pdfs_features:
+        token_type_trainer = TokenTypeTrainer(pdfs_features, ModelConfiguration())
+        token_type_trainer.set_token_types(join(MODELS_PATH, "token_type_lightgbm.model"))
 
-    trainer = ParagraphExtractorTrainer(
-        pdfs_features=[pdf_images.pdf_features], model_configuration=PARAGRAPH_EXTRACTION_CONFIGURATION
-    )
-    segments = trainer.get_pdf_segments(join(MODELS_PATH, "paragraph_extraction_lightgbm.model"))
+        trainer = ParagraphExtractorTrainer(
+            pdfs_features=pdfs_features, model_configuration=PARAGRAPH_EXTRACTION_CONFIGURATION
+        )
+        all_segments = trainer.get_pdf_segments(join(MODELS_PATH, "paragraph_extraction_lightgbm.model"))
 
-    extract_formula_format(pdf_images, segments)
-    if extraction_format:
-        extract_table_format(pdf_images, segments, extraction_format)
+    results = []
+    for pdf_path, pdf_images, pages_view, pages_fingerprints, cached_segments in zip(
+        pdf_paths, pdf_images_list, pages_views, pages_fingerprints_list, cached_segments_list
+    ):
+        new_segments = [segment for segment in all_segments if segment.pdf_name == Path(pdf_path).name]
+        extract_formula_format(pdf_images, new_segments)
+        store_segments(pages_fingerprints, [page.page_number for page in pages_view.pdf_features.pages], new_segments)
+        segments = merge_segments(pdf_images, cached_segments, new_segments)
+        if extraction_format:
+            extract_table_format(pdf_images, segments, extraction_format)
+
+        pdf_images.remove_images()
+        if not keep_pdf:
+            pdf_path.unlink(missing_ok=True)
+        count_segments(segments, "fast")
+        results.append(SegmentBox.get_segments_dicts(segments, pdf_images.pdf_features.pages))
+    return results
+
+
+def analyze_pdf_tokens(file: AnyStr, ocr: bool = False, language: str = "en") -> dict:
+    """Tokens with the LightGBM token type predictions, without rasterizing the pages or merging paragraphs"""
+    pdf_path = pdf_content_to_pdf_path(file)
+    if ocr:
+        ocr_pdf_in_place(pdf_path, language)
+    pdf_features = PdfFeatures.from_pdf_path(pdf_path)
+    count_pages_and_tokens(pdf_features, "fast")
+
+    token_type_trainer = TokenTypeTrainer([pdf_features], ModelConfiguration())
+    token_type_trainer.set_token_types(join(MODELS_PATH, "token_type_lightgbm.model"))
 
-    pdf_images.remove_images()
-    if not keep_pdf:
-        pdf_path.unlink(missing_ok=True)
-    return [SegmentBox.from_pdf_segment(pdf_segment, pdf_images.pdf_features.pages).to_dict() for pdf_segment in segments]
+    pdf_path.unlink(missing_ok=True)
+    return get_tokens_payload(pdf_features, token_type_trainer.probabilities)
@@ -1,17 +1,18 @@
 import os
+from functools import lru_cache
 from os.path import exists, join
 from pathlib import Path
 
 import lightgbm as lgb
 import numpy as np
 
+from ..metrics.pipeline_metrics import set_lightgbm_model_memory
 from ..pdf_features.PdfFeatures import PdfFeatures
 from ..pdf_features.PdfFont import PdfFont
 from ..pdf_features.PdfToken import PdfToken
 from ..pdf_features.Rectangle import Rectangle
 from ..pdf_token_type_labels.TokenType import TokenType
 from ..pdf_tokens_type_trainer.ModelConfiguration import ModelConfiguration
-from ..pdf_tokens_type_trainer.download_models import pdf_tokens_type_model
 
 
 class PdfTrainer:
@@ -52,6 +53,7 @@ class PdfTrainer:
 
         print(f"Saving")
         gbm.save_model(model_path, num_iteration=gbm.best_iteration)
+        PdfTrainer.get_lightgbm_model.cache_clear()
 
     def loop_tokens(self):
         for pdf_features in self.pdfs_features:
@@ -70,14 +72,24 @@ class PdfTrainer:
             token_type=TokenType.TEXT,
         )
 
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get_lightgbm_model(model_path: str) -> lgb.Booster:
+        lightgbm_model = lgb.Booster(model_file=model_path)
+        set_lightgbm_model_memory(Path(model_path).stem, lightgbm_model)
+        return lightgbm_model
+
     def predict(self, model_path: str | Path = None):
-        model_path = model_path if model_path else pdf_tokens_type_model
+        if not model_path:
+            from ..pdf_tokens_type_trainer.download_models import pdf_tokens_type_model
+
+            model_path = pdf_tokens_type_model
         x = self.get_model_input()
 
         if not x.any():
             return self.pdfs_features
 
-        lightgbm_model = lgb.Booster(model_file=model_path)
+        lightgbm_model = self.get_lightgbm_model(str(model_path))
         return lightgbm_model.predict(x)
 
     def save_training_data(self, save_folder_path: str | Path, labels: list[int]):
@@ -1,10 +1,17 @@
+from functools import partial
 from pathlib import Path
 
 import numpy as np
 from tqdm import tqdm
 
+from ..metrics.pipeline_metrics import timed_stage
+from ..parallel.page_executor import map_pages
+from ..pdf_features.PdfFeatures import PdfFeatures
+from ..pdf_features.PdfModes import PdfModes
+from ..pdf_features.PdfPage import PdfPage
 from ..pdf_features.PdfToken import PdfToken
 from ..pdf_token_type_labels.TokenType import TokenType
+from ..pdf_tokens_type_trainer.ModelConfiguration import ModelConfiguration
 from ..pdf_tokens_type_trainer.PdfTrainer import PdfTrainer
 from ..pdf_tokens_type_trainer.TokenFeatures import TokenFeatures
 
@@ -13,21 +20,30 @@ class TokenTypeTrainer(PdfTrainer):
     def get_model_input(self) -> np.ndarray:
         features_rows = []
 
-        contex_size = self.model_configuration.context_size
-        for token_features, page in self.loop_token_features():
-            page_tokens = [
-                self.get_padding_token(segment_number=i - 999999, page_number=page.page_number) for i in range(contex_size)
-            ]
-            page_tokens += page.tokens
-            page_tokens += [
-                self.get_padding_token(segment_number=999999 + i, page_number=page.page_number) for i in range(contex_size)
-            ]
+        for pdf_features in tqdm(self.pdfs_features):
+            pages = [page for page in pdf_features.pages if page.tokens]
+            get_page_rows = partial(
+                get_page_model_input, type(self), self.model_configuration, pdf_features.pdf_modes.model_dump()
+            )
+            features_rows.extend(rows for rows in map_pages(get_page_rows, pages) if len(rows))
+
+        if not features_rows:
+            return np.zeros((0, 0))
 
-            tokens_indexes = range(contex_size, len(page_tokens) - contex_size)
-            page_features = [self.get_context_features(token_features, page_tokens, i) for i in tokens_indexes]
-            features_rows.extend(page_features)
+        return np.concatenate(features_rows)
 
-        return self.features_rows_to_x(features_rows)
+    def get_page_features_rows(self, token_features: TokenFeatures, page: PdfPage):
+        contex_size = self.model_configuration.context_size
+        page_tokens = [
+            self.get_padding_token(segment_number=i - 999999, page_number=page.page_number) for i in range(contex_size)
+        ]
+        page_tokens += page.tokens
+        page_tokens += [
+            self.get_padding_token(segment_number=999999 + i, page_number=page.page_number) for i in range(contex_size)
+        ]
+
+        tokens_indexes = range(contex_size, len(page_tokens) - contex_size)
+        return [self.get_context_features(token_features, page_tokens, i) for i in tokens_indexes]
 
     def loop_token_features(self):
         for pdf_features in tqdm(self.pdfs_features):
@@ -51,6 +67,7 @@ class TokenTypeTrainer(PdfTrainer):
 
     def predict(self, model_path: str | Path = None):
         predictions = super().predict(model_path)
+        self.probabilities = predictions if isinstance(predictions, np.ndarray) else np.zeros((0, len(TokenType)))
         predictions_assigned = 0
         for token_features, page in self.loop_token_features():
             for token, prediction in zip(
@@ -60,7 +77,15 @@ class TokenTypeTrainer(PdfTrainer):
 
             predictions_assigned += len(page.tokens)
 
+    @timed_stage("token_type_prediction")
     def set_token_types(self, model_path: str | Path = None):
         self.predict(model_path)
         for token in self.loop_tokens():
             token.token_type = TokenType.from_index(token.prediction)
+
+
+def get_page_model_input(trainer_class: type, model_configuration: ModelConfiguration, pdf_modes: dict, page: PdfPage):
+    pdf_features = PdfFeatures.get_empty()
+    pdf_features.pdf_modes = PdfModes(**pdf_modes)
+    trainer = trainer_class([pdf_features], model_configuration)
+    return PdfTrainer.features_rows_to_x(trainer.get_page_features_rows(TokenFeatures(pdf_features), page))
@@ -0,0 +1,52 @@
+from unittest import TestCase
+
+import torch
+
+from src.ditod import VGTbeit
+
+WINDOW_SIZE = (4, 4)
+TOKENS_COUNT = WINDOW_SIZE[0] * WINDOW_SIZE[1] + 1
+
+
+def get_module(module_class, **kwargs):
+    torch.manual_seed(0)
+    module = module_class(64, num_heads=4, qkv_bias=True, **kwargs).eval()
+    for parameter in module.parameters():
+        torch.nn.init.normal_(parameter, std=0.02)
+    return module
+
+
+def get_outputs(function) -> dict[bool, torch.Tensor]:
+    """Outputs with the fused scaled dot product attention and with the original attention math"""
+    fused_attention = VGTbeit.USE_FUSED_ATTENTION
+    outputs = {}
+    try:
+        for fused in [False, True]:
+            VGTbeit.USE_FUSED_ATTENTION = fused
+            with torch.no_grad():
+                outputs[fused] = function()
+    finally:
+        VGTbeit.USE_FUSED_ATTENTION = fused_attention
+    return outputs
+
+
+class TestAttention(TestCase):
+    def setUp(self):
+        torch.manual_seed(1)
+        self.x = torch.randn(2, TOKENS_COUNT, 64)
+        self.y = torch.randn(2, TOKENS_COUNT, 64)
+
+    def test_attention(self):
+        attention = get_module(VGTbeit.Attention)
+        outputs = get_outputs(lambda: attention(self.x))
+        self.assertTrue(torch.allclose(outputs[True], outputs[False], atol=1e-4))
+
+    def test_attention_with_relative_position_bias(self):
+        attention = get_module(VGTbeit.Attention, window_size=WINDOW_SIZE)
+        outputs = get_outputs(lambda: attention(self.x, training_window_size=torch.tensor(WINDOW_SIZE)))
+        self.assertTrue(torch.allclose(outputs[True], outputs[False], atol=1e-4))
+
+    def test_cross_attention(self):
+        cross_attention = get_module(VGTbeit.CrossAttention)
+        outputs = get_outputs(lambda: cross_attention(self.x, self.y))
+        self.assertTrue(torch.allclose(outputs[True], outputs[False], atol=1e-4))
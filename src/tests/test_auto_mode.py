@@ -0,0 +1,68 @@
+import random
+from types import SimpleNamespace
+from unittest import TestCase
+
+import numpy as np
+
+from src.benchmarks.synthetic_documents import get_page_xml
+from src.cache.page_results_cache import merge_segments
+from src.fast_trainer.PdfSegment import PdfSegment
+from src.pdf_features.PdfFeatures import PdfFeatures
+from src.pdf_features.Rectangle import Rectangle
+from src.pdf_layout_analysis.run_pdf_layout_analysis_auto import get_uncertain_pages
+from src.pdf_token_type_labels.TokenType import TokenType
+
+CONFIDENT = [0.99, 0.01]
+UNCERTAIN = [0.5, 0.5]
+
+
+def get_pdf_features(tokens_per_page: list[int], file_name: str) -> PdfFeatures:
+    random_generator = random.Random(22)
+    pages = [get_page_xml(number, tokens, random_generator) for number, tokens in enumerate(tokens_per_page, start=1)]
+    fonts = '<fontspec id="0" size="10" family="Times" color="#000000"/>'
+    fonts += '<fontspec id="1" size="14" family="Times-Bold" color="#000000"/>'
+    xml_content = '<?xml version="1.0" encoding="UTF-8"?><pdf2xml>' + fonts + "".join(pages) + "</pdf2xml>"
+    return PdfFeatures.from_poppler_etree_content(f"test/{file_name}.xml", xml_content, file_name)
+
+
+def get_segment(page_number: int, name: str) -> PdfSegment:
+    return PdfSegment(page_number, Rectangle.from_width_height(0, 0, 10, 10), name, TokenType.TEXT, "test")
+
+
+class TestAutoMode(TestCase):
+    def test_get_uncertain_pages_across_documents(self):
+        first_pdf_features = get_pdf_features([2, 0, 3], "first")
+        second_pdf_features = get_pdf_features([1, 2], "second")
+        probabilities = np.array(
+            [CONFIDENT, CONFIDENT] + [UNCERTAIN, UNCERTAIN, UNCERTAIN] + [UNCERTAIN] + [CONFIDENT, CONFIDENT]
+        )
+
+        uncertain_pages = get_uncertain_pages([first_pdf_features, second_pdf_features], probabilities)
+
+        self.assertEqual([{2, 3}, {1}], uncertain_pages)
+
+    def test_get_uncertain_pages_with_tables(self):
+        pdf_features = get_pdf_features([2, 2], "tables")
+        pdf_features.pages[1].tokens[0].token_type = TokenType.TABLE
+        probabilities = np.array([CONFIDENT] * 4)
+
+        self.assertEqual([{2}], get_uncertain_pages([pdf_features], probabilities))
+
+    def test_merge_segments_alternating_pages(self):
+        pdf_images = SimpleNamespace(pdf_features=get_pdf_features([1, 1, 1, 1], "alternating"))
+        vgt_segments = [get_segment(1, "vgt 1a"), get_segment(1, "vgt 1b"), get_segment(3, "vgt 3")]
+        fast_segments = [get_segment(2, "fast 2"), get_segment(4, "fast 4a"), get_segment(4, "fast 4b")]
+
+        segments = merge_segments(pdf_images, {}, vgt_segments + fast_segments)
+
+        texts = [segment.text_content for segment in segments]
+        self.assertEqual(["vgt 1a", "vgt 1b", "fast 2", "vgt 3", "fast 4a", "fast 4b"], texts)
+
+    def test_merge_segments_with_cached_pages(self):
+        pdf_images = SimpleNamespace(pdf_features=get_pdf_features([1, 1, 1], "cached"))
+        cached_segments = {2: [get_segment(2, "cached 2")]}
+        new_segments = [get_segment(3, "new 3"), get_segment(1, "new 1")]
+
+        segments = merge_segments(pdf_images, cached_segments, new_segments)
+
+        self.assertEqual(["new 1", "cached 2", "new 3"], [segment.text_content for segment in segments])
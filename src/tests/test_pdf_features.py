@@ -0,0 +1,87 @@
+import random
+from statistics import mode
+from unittest import TestCase
+
+from src.pdf_features.PdfFeatures import PdfFeatures
+from src.pdf_features.PdfToken import PdfToken
+from src.pdf_features.PdfTokenContext import PdfTokenContext
+
+
+def get_pdf_features(pages_count: int, tokens_per_page: int) -> PdfFeatures:
+    """Tokens at random positions, so that lines overlap and tokens share lines with tokens on both sides"""
+    random_generator = random.Random(22)
+    pages = []
+    for page_number in range(1, pages_count + 1):
+        texts = []
+        for _ in range(tokens_per_page):
+            top, left = random_generator.randint(0, 700), random_generator.randint(0, 550)
+            width, height = random_generator.randint(5, 60), random_generator.randint(4, 14)
+            texts.append(f'<text top="{top}" left="{left}" width="{width}" height="{height}" font="0">word</text>')
+        page_attributes = f'number="{page_number}" position="absolute" top="0" left="0" height="792" width="612"'
+        pages.append(f"<page {page_attributes}>" + "".join(texts) + "</page>")
+    fonts = '<fontspec id="0" size="10" family="Times" color="#000000"/>'
+    xml_content = '<?xml version="1.0" encoding="UTF-8"?><pdf2xml>' + fonts + "".join(pages) + "</pdf2xml>"
+    return PdfFeatures.from_poppler_etree_content("test/layout.xml", xml_content, "layout")
+
+
+def get_token_context(token: PdfToken, page_tokens: list[PdfToken]) -> list[float]:
+    token = token.model_copy(update={"pdf_token_context": PdfTokenContext()})
+    token.get_context(page_tokens)
+    context = token.pdf_token_context
+    return [
+        context.right_of_token_on_the_left,
+        context.left_of_token_on_the_left,
+        context.left_of_token_on_the_right,
+        context.right_of_token_on_the_right,
+    ]
+
+
+def get_line_spaces(page_tokens: list[PdfToken]) -> list[int]:
+    line_spaces = []
+    for token in page_tokens:
+        bottom = token.bounding_box.bottom
+        on_the_bottom = [page_token for page_token in page_tokens if bottom < page_token.bounding_box.top]
+        if on_the_bottom:
+            line_spaces.append(min(int(page_token.bounding_box.top - bottom) for page_token in on_the_bottom))
+    return line_spaces
+
+
+def get_right_spaces(page_tokens: list[PdfToken]) -> list[int]:
+    right_spaces = []
+    for token in page_tokens:
+        right = token.bounding_box.right
+        line_tokens = PdfToken.get_same_line_tokens(token, page_tokens)
+        if not [line_token for line_token in line_tokens if right < line_token.bounding_box.left]:
+            right_spaces.append(int(right))
+    return right_spaces
+
+
+class TestPdfFeatures(TestCase):
+    def test_get_page_layout(self):
+        pdf_features = get_pdf_features(2, 150)
+        for page in pdf_features.pages:
+            line_spaces, right_spaces, contexts = PdfFeatures.get_page_layout(PdfFeatures.get_page_boxes(page), 64)
+
+            self.assertEqual(get_line_spaces(page.tokens), line_spaces)
+            self.assertEqual(get_right_spaces(page.tokens), right_spaces)
+            self.assertEqual([get_token_context(token, page.tokens) for token in page.tokens], contexts.tolist())
+
+    def test_model_post_init(self):
+        pdf_features = get_pdf_features(3, 60)
+        line_spaces, right_spaces = [0], [0]
+        for page in pdf_features.pages:
+            line_spaces.extend(get_line_spaces(page.tokens))
+            right_spaces.extend(get_right_spaces(page.tokens))
+            for token in page.tokens:
+                context = list(token.pdf_token_context.model_dump().values())
+                self.assertEqual(get_token_context(token, page.tokens), context)
+
+        self.assertEqual(mode(line_spaces), pdf_features.pdf_modes.lines_space_mode)
+        self.assertEqual(int(612 - mode(right_spaces)), pdf_features.pdf_modes.right_space_mode)
+
+    def test_get_page_layout_without_tokens(self):
+        line_spaces, right_spaces, contexts = PdfFeatures.get_page_layout(
+            PdfFeatures.get_page_boxes(get_pdf_features(1, 0).pages[0])
+        )
+
+        self.assertEqual(([], [], []), (line_spaces, right_spaces, contexts.tolist()))
@@ -0,0 +1,50 @@
+from unittest import TestCase
+
+import torch
+
+from src.ditod import VGTbeit
+
+WINDOW_SIZE = (4, 4)
+
+
+def get_attention() -> VGTbeit.Attention:
+    torch.manual_seed(0)
+    attention = VGTbeit.Attention(64, num_heads=4, qkv_bias=True, window_size=WINDOW_SIZE).eval()
+    for parameter in attention.parameters():
+        torch.nn.init.normal_(parameter, std=0.02)
+    return attention
+
+
+class TestWindowSizeCache(TestCase):
+    def setUp(self):
+        self.attention = get_attention()
+        self.training_window_size = torch.tensor((3, 5))
+        torch.manual_seed(1)
+        self.x = torch.randn(1, 3 * 5 + 1, 64)
+
+    def get_output(self) -> torch.Tensor:
+        with torch.no_grad():
+            return self.attention(self.x, training_window_size=self.training_window_size)
+
+    def get_uncached_output(self) -> torch.Tensor:
+        entries = self.attention.bias_tables_cache.entries.copy()
+        self.attention.bias_tables_cache.clear()
+        output = self.get_output()
+        self.attention.bias_tables_cache.entries = entries
+        return output
+
+    def test_cached_bias_table(self):
+        first_output = self.get_output()
+        second_output = self.get_output()
+
+        self.assertEqual(1, len(self.attention.bias_tables_cache.entries))
+        self.assertTrue(torch.equal(self.get_uncached_output(), first_output))
+        self.assertTrue(torch.equal(self.get_uncached_output(), second_output))
+
+    def test_cached_bias_table_after_weights_update(self):
+        self.get_output()
+        with torch.no_grad():
+            self.attention.relative_position_bias_table.mul_(2)
+
+        self.assertTrue(torch.equal(self.get_uncached_output(), self.get_output()))
+        self.assertEqual(2, len(self.attention.bias_tables_cache.entries))
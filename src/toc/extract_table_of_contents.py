@@ -9,6 +9,7 @@ from ..pdf_features.Rectangle import Rectangle
 from ..pdf_token_type_labels.TokenType import TokenType
 from .TOCExtractor import TOCExtractor
 from ..configuration import service_logger
+from ..metrics.pipeline_metrics import timed_stage
 from .PdfSegmentation import PdfSegmentation
 
 TITLE_TYPES = {TokenType.TITLE, TokenType.SECTION_HEADER}
@@ -60,6 +61,7 @@ def get_pdf_segments_from_segment_boxes(pdf_features: PdfFeatures, segment_boxes
     return pdf_segments
 
 
+@timed_stage("toc")
 def extract_table_of_contents(file: AnyStr, segment_boxes: list[dict], skip_document_name=False):
     service_logger.info("Getting TOC")
     pdf_path = pdf_content_to_pdf_path(file)
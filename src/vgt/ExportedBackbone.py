@@ -0,0 +1,43 @@
+import torch
+from torch import nn
+
+from ..configuration import service_logger
+
+
+class ExportedBackbone(nn.Module):
+    """Runs the VGT backbone and FPN with the TorchScript module exported for the input shape, or the eager backbone.
+    The RPN and ROI heads stay in Python, so the model outputs and the predictions are the same.
+    The exported modules are traced in FP32, they run with autocast disabled when VGT_PRECISION is bf16 or fp16"""
+
+    def __init__(self, backbone: nn.Module, traced_backbones: dict[tuple[int, ...], torch.jit.ScriptModule]):
+        super().__init__()
+        self.backbone = backbone
+        self.traced_backbones = traced_backbones
+        self.record_missing_inputs = False
+        self.missing_inputs: dict[tuple[int, ...], tuple[torch.Tensor, torch.Tensor]] = {}
+        self.autocast_disabled_logged = False
+
+    @property
+    def size_divisibility(self) -> int:
+        return self.backbone.size_divisibility
+
+    @property
+    def padding_constraints(self) -> dict:
+        return getattr(self.backbone, "padding_constraints", {})
+
+    def output_shape(self):
+        return self.backbone.output_shape()
+
+    def forward(self, x, grid):
+        shape = tuple(x.shape)
+        if shape in self.traced_backbones and (torch.is_autocast_enabled() or torch.is_autocast_cpu_enabled()):
+            if not self.autocast_disabled_logged:
+                service_logger.info("Exported VGT backbones are traced in fp32, running them without autocast")
+                self.autocast_disabled_logged = True
+            with torch.autocast(x.device.type, enabled=False):
+                return self.traced_backbones[shape](x.float(), grid.float())
+        if shape in self.traced_backbones:
+            return self.traced_backbones[shape](x, grid)
+        if self.record_missing_inputs:
+            self.missing_inputs.setdefault(shape, (x, grid))
+        return self.backbone(x, grid)
@@ -0,0 +1,11 @@
+from detectron2.checkpoint import DetectionCheckpointer
+from safetensors.torch import load_file
+
+
+class SafetensorsCheckpointer(DetectionCheckpointer):
+    """Loads .safetensors weights memory mapped, instead of unpickling the whole checkpoint"""
+
+    def _load_file(self, filename: str) -> dict:
+        if filename.endswith(".safetensors"):
+            return {"model": load_file(filename)}
+        return super()._load_file(filename)
@@ -0,0 +1,47 @@
+import json
+
+import numpy as np
+
+from ..configuration import VGT_ADAPTIVE_RESOLUTION, VGT_SPARSE_PAGE_TOKENS, VGT_SPARSE_PAGE_INK
+from ..configuration import VGT_SPARSE_PAGE_CONTENT, VGT_SPARSE_PAGE_MIN_SIZE
+
+INK_THRESHOLD = 200
+SAMPLING_STEP = 4
+RESOLUTION_POLICY = {
+    "enabled": VGT_ADAPTIVE_RESOLUTION,
+    "sparse_tokens": VGT_SPARSE_PAGE_TOKENS,
+    "sparse_ink": VGT_SPARSE_PAGE_INK,
+    "sparse_content": VGT_SPARSE_PAGE_CONTENT,
+    "sparse_min_size": VGT_SPARSE_PAGE_MIN_SIZE,
+}
+
+
+def get_ink_statistics(image: np.ndarray) -> tuple[float, float]:
+    """Fraction of dark pixels, and fraction of the page inside the box around them"""
+    ink = image[::SAMPLING_STEP, ::SAMPLING_STEP].min(axis=2) < INK_THRESHOLD
+    if not ink.any():
+        return 0.0, 0.0
+    rows = np.flatnonzero(ink.any(axis=1))
+    columns = np.flatnonzero(ink.any(axis=0))
+    content_area = (rows[-1] - rows[0] + 1) * (columns[-1] - columns[0] + 1)
+    return float(ink.mean()), float(content_area / ink.size)
+
+
+def is_sparse_page(image: np.ndarray, tokens_count: int) -> bool:
+    """Few word grid tokens and little ink (not a scan without text), or content in a small part of the page"""
+    ink_fraction, content_fraction = get_ink_statistics(image)
+    if tokens_count < RESOLUTION_POLICY["sparse_tokens"] and ink_fraction < RESOLUTION_POLICY["sparse_ink"]:
+        return True
+    return content_fraction < RESOLUTION_POLICY["sparse_content"]
+
+
+def get_test_sizes(image: np.ndarray, tokens_count: int, min_size: int, max_size: int) -> tuple[int, int]:
+    """Shortest and longest edge sizes of the VGT input, sparse pages get fewer ViT patches"""
+    if not is_sparse_page(image, tokens_count):
+        return min_size, max_size
+    sparse_min_size = min(min_size, RESOLUTION_POLICY["sparse_min_size"])
+    return sparse_min_size, round(max_size * sparse_min_size / min_size)
+
+
+def get_resolution_context() -> str:
+    return "|" + json.dumps(RESOLUTION_POLICY, sort_keys=True) if RESOLUTION_POLICY["enabled"] else ""
@@ -1,17 +1,25 @@
 import pickle
 import shutil
+from functools import lru_cache, partial
 
 import numpy as np
 from os import makedirs
 from os.path import join, exists
+from ..parallel.page_executor import map_pages
+from ..pdf_features.PdfPage import PdfPage
 from ..pdf_features.PdfToken import PdfToken
 from ..pdf_features.Rectangle import Rectangle
 from ..pdf_features.PdfFeatures import PdfFeatures
 
-from ..bros.tokenization_bros import BrosTokenizer
+from ..metrics.pipeline_metrics import timed_stage
 from ..configuration import WORD_GRIDS_PATH
 
-tokenizer = BrosTokenizer.from_pretrained("naver-clova-ocr/bros-base-uncased")
+
+@lru_cache
+def get_tokenizer():
+    from ..bros.tokenization_bros import BrosTokenizer
+
+    return BrosTokenizer.from_pretrained("naver-clova-ocr/bros-base-uncased")
 
 
 def rectangle_to_bbox(rectangle: Rectangle):
@@ -44,6 +52,7 @@ def get_words_positions(text: str, rectangle: Rectangle):
 
 def get_subwords_positions(word: str, rectangle: Rectangle):
     width_per_letter = rectangle.width / len(word)
+    tokenizer = get_tokenizer()
     word_tokens = [x.replace("#", "") for x in tokenizer.tokenize(word)]
 
     if not word_tokens:
@@ -80,17 +89,24 @@ def get_grid_words_dict(tokens: list[PdfToken]):
     }
 
 
+@timed_stage("word_grid")
 def create_word_grid(pdf_features_list: list[PdfFeatures]):
     makedirs(WORD_GRIDS_PATH, exist_ok=True)
 
     for pdf_features in pdf_features_list:
-        for page in pdf_features.pages:
-            image_id = f"{pdf_features.file_name}_{page.page_number - 1}"
-            if exists(join(WORD_GRIDS_PATH, image_id + ".pkl")):
-                continue
-            grid_words_dict = get_grid_words_dict(page.tokens)
-            with open(join(WORD_GRIDS_PATH, f"{image_id}.pkl"), mode="wb") as file:
-                pickle.dump(grid_words_dict, file)
+        pages = [
+            page
+            for page in pdf_features.pages
+            if not exists(join(WORD_GRIDS_PATH, f"{pdf_features.file_name}_{page.page_number - 1}.pkl"))
+        ]
+        map_pages(partial(create_page_word_grid, pdf_features.file_name), pages)
+
+
+def create_page_word_grid(file_name: str, page: PdfPage):
+    image_id = f"{file_name}_{page.page_number - 1}"
+    grid_words_dict = get_grid_words_dict(page.tokens)
+    with open(join(WORD_GRIDS_PATH, f"{image_id}.pkl"), mode="wb") as file:
+        pickle.dump(grid_words_dict, file)
 
 
 def remove_word_grids():
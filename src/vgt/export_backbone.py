@@ -0,0 +1,104 @@
+import argparse
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import torch
+
+from ..cache.page_results_cache import get_models_fingerprint, VGT_MODEL_FILES
+from ..configuration import VGT_EXPORT_PATH, service_logger
+from ..vgt.ExportedBackbone import ExportedBackbone
+
+EXPORT_PARITY_TOLERANCE = 1e-4
+
+
+def get_backbone_path(shape: tuple[int, ...]) -> Path:
+    return Path(VGT_EXPORT_PATH, "x".join(str(size) for size in shape) + ".pt")
+
+
+def load_traced_backbones(device: str) -> dict[tuple[int, ...], torch.jit.ScriptModule]:
+    """The exported modules of the current VGT weights, by input shape"""
+    source_fingerprint = get_models_fingerprint(VGT_MODEL_FILES)
+    traced_backbones = {}
+    for backbone_path in sorted(VGT_EXPORT_PATH.glob("*.pt")):
+        extra_files = {"source": ""}
+        traced_backbone = torch.jit.load(backbone_path, map_location=device, _extra_files=extra_files)
+        if extra_files["source"] != source_fingerprint.encode():
+            service_logger.info(f"Skipping {backbone_path.name}, it was exported from other VGT weights")
+            continue
+        traced_backbones[tuple(int(size) for size in backbone_path.stem.split("x"))] = traced_backbone
+    return traced_backbones
+
+
+def use_exported_backbone(model: torch.nn.Module) -> ExportedBackbone:
+    if not isinstance(model.backbone, ExportedBackbone):
+        model.backbone = ExportedBackbone(model.backbone, load_traced_backbones(str(model.device)))
+        service_logger.info(f"Using {len(model.backbone.traced_backbones)} exported VGT backbones")
+    return model.backbone
+
+
+def get_max_difference(outputs: dict[str, torch.Tensor], traced_outputs: dict[str, torch.Tensor]) -> float:
+    return max((outputs[name] - traced_outputs[name]).abs().max().item() for name in outputs)
+
+
+def trace_backbone(backbone: torch.nn.Module, inputs: tuple[torch.Tensor, torch.Tensor]) -> torch.jit.ScriptModule | None:
+    """Traced and frozen backbone for the shape of the inputs, None if its outputs differ from the eager backbone"""
+    with torch.no_grad():
+        traced_backbone = torch.jit.freeze(torch.jit.trace(backbone.eval(), inputs, strict=False))
+        max_difference = get_max_difference(backbone(*inputs), traced_backbone(*inputs))
+
+    service_logger.info(f"Traced backbone for {tuple(inputs[0].shape)}, max difference {max_difference:.2e}")
+    return traced_backbone if max_difference <= EXPORT_PARITY_TOLERANCE else None
+
+
+def save_traced_backbone(traced_backbone: torch.jit.ScriptModule, shape: tuple[int, ...]):
+    os.makedirs(VGT_EXPORT_PATH, exist_ok=True)
+    extra_files = {"source": get_models_fingerprint(VGT_MODEL_FILES)}
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=VGT_EXPORT_PATH)
+    with os.fdopen(file_descriptor, "wb") as file:
+        torch.jit.save(traced_backbone, file, _extra_files=extra_files)
+    os.replace(temporary_path, get_backbone_path(shape))
+
+
+def export_backbones(pdf_paths: list[Path]) -> int:
+    """Runs VGT on the PDFs to find their input shapes, and exports the backbone for the shapes not exported yet"""
+    from ..cache.page_results_cache import PAGE_RESULTS_CACHE
+    from ..cache.vgt_predictions_cache import VGT_PREDICTIONS_CACHE
+    from ..pdf_layout_analysis.run_pdf_layout_analysis import analyze_pdf, get_model_and_config
+
+    PAGE_RESULTS_CACHE.max_bytes = 0
+    VGT_PREDICTIONS_CACHE.max_bytes = 0
+    model, _ = get_model_and_config()
+    model.inference_precision = "fp32"
+    exported_backbone = use_exported_backbone(model)
+    exported_backbone.record_missing_inputs = True
+    for pdf_path in pdf_paths:
+        service_logger.info(f"Collecting VGT input shapes of {pdf_path.name}")
+        analyze_pdf(pdf_path.read_bytes(), "", quantized=False)
+    exported_backbone.record_missing_inputs = False
+
+    failed_shapes = 0
+    for shape, inputs in exported_backbone.missing_inputs.items():
+        traced_backbone = trace_backbone(exported_backbone.backbone, inputs)
+        if traced_backbone is None:
+            service_logger.error(f"The traced backbone for {shape} differs from the eager one, not exported")
+            failed_shapes += 1
+            continue
+        save_traced_backbone(traced_backbone, shape)
+        exported_backbone.traced_backbones[shape] = traced_backbone
+    exported_backbone.missing_inputs = {}
+
+    service_logger.info(f"{len(exported_backbone.traced_backbones)} VGT backbones exported in {VGT_EXPORT_PATH}")
+    return 1 if failed_shapes else 0
+
+
+def get_arguments_parser():
+    parser = argparse.ArgumentParser(description="Export the VGT backbone and FPN as TorchScript for the input shapes")
+    parser.add_argument("pdfs", help="Folder with PDFs whose page sizes the service will analyze")
+    return parser
+
+
+if __name__ == "__main__":
+    arguments = get_arguments_parser().parse_args()
+    sys.exit(export_backbones(sorted(Path(arguments.pdfs).glob("*.pdf"))))
@@ -12,6 +12,8 @@ from ..pdf_token_type_labels.TokenType import TokenType
 from ..data_model.PdfImages import PdfImages
 from ..configuration import SRC_PATH, JSONS_ROOT_PATH, DOCLAYNET_TYPE_BY_ID
 from ..data_model.Prediction import Prediction
+from ..cache.vgt_predictions_cache import store_predictions
+from ..metrics.pipeline_metrics import timed_stage
 
 
 def get_prediction_from_annotation(annotation, images_names, vgt_predictions_dict):
@@ -90,10 +92,26 @@ def merge_colliding_predictions(predictions: list[Prediction]):
         predictions = new_predictions
 
 
+def get_page_predictions(page_pdf_name, vgt_predictions_dict, cached_predictions, predictions_keys) -> list[Prediction]:
+    if page_pdf_name in cached_predictions:
+        return cached_predictions[page_pdf_name]
+
+    predictions = merge_colliding_predictions(vgt_predictions_dict[page_pdf_name])
+    if predictions and page_pdf_name in predictions_keys:
+        store_predictions(predictions_keys[page_pdf_name], predictions)
+    return predictions
+
+
+def store_empty_predictions(page_pdf_name, cached_predictions, predictions_keys):
+    """Pages without VGT predictions, like blank pages, are cached too so that they do not run the model again.
+    An empty cached list always means no predictions, get_page_predictions does not store empty merged predictions"""
+    if page_pdf_name not in cached_predictions and page_pdf_name in predictions_keys:
+        store_predictions(predictions_keys[page_pdf_name], [])
+
+
 def get_pdf_segments_for_page(page, pdf_name, page_pdf_name, vgt_predictions_dict):
     most_probable_pdf_segments_for_page: list[PdfSegment] = []
     most_probable_tokens_by_predictions: dict[Prediction, list[PdfToken]] = {}
-    vgt_predictions_dict[page_pdf_name] = merge_colliding_predictions(vgt_predictions_dict[page_pdf_name])
 
     for token in page.tokens:
         find_best_prediction_for_token(page_pdf_name, token, vgt_predictions_dict, most_probable_tokens_by_predictions)
@@ -123,15 +141,37 @@ def prediction_exists_for_page(page_pdf_name, vgt_predictions_dict):
     return page_pdf_name in vgt_predictions_dict
 
 
-def get_most_probable_pdf_segments(model_name: str, pdf_images_list: list[PdfImages], save_output: bool = False):
+@timed_stage("post_processing")
+def get_most_probable_pdf_segments(
+    model_name: str,
+    pdf_images_list: list[PdfImages],
+    save_output: bool = False,
+    cached_predictions: dict[str, list[Prediction]] = None,
+    predictions_keys: dict[str, str] = None,
+):
+    cached_predictions = cached_predictions if cached_predictions else {}
+    predictions_keys = predictions_keys if predictions_keys else {}
     most_probable_pdf_segments: list[PdfSegment] = []
-    vgt_predictions_dict = get_vgt_predictions(model_name)
     pdf_features_list: list[PdfFeatures] = [pdf_images.pdf_features for pdf_images in pdf_images_list]
+    pages_pdf_names = [
+        pdf_features.file_name + "_" + str(page.page_number - 1)
+        for pdf_features in pdf_features_list
+        for page in pdf_features.pages
+    ]
+    model_was_run = any(page_pdf_name not in cached_predictions for page_pdf_name in pages_pdf_names)
+    vgt_predictions_dict = get_vgt_predictions(model_name) if model_was_run else {}
     for pdf_features in pdf_features_list:
         for page in pdf_features.pages:
             page_pdf_name = pdf_features.file_name + "_" + str(page.page_number - 1)
-            if not prediction_exists_for_page(page_pdf_name, vgt_predictions_dict):
+            if cached_predictions.get(page_pdf_name) == [] or (
+                page_pdf_name not in cached_predictions
+                and not prediction_exists_for_page(page_pdf_name, vgt_predictions_dict)
+            ):
+                store_empty_predictions(page_pdf_name, cached_predictions, predictions_keys)
                 continue
+            vgt_predictions_dict[page_pdf_name] = get_page_predictions(
+                page_pdf_name, vgt_predictions_dict, cached_predictions, predictions_keys
+            )
             page_segments = get_pdf_segments_for_page(page, pdf_features.file_name, page_pdf_name, vgt_predictions_dict)
             most_probable_pdf_segments.extend(page_segments)
     if save_output:
@@ -4,6 +4,8 @@ from ..pdf_features.PdfToken import PdfToken
 from ..pdf_token_type_labels.TokenType import TokenType
 
 from ..data_model.PdfImages import PdfImages
+from ..metrics.pipeline_metrics import timed_stage
+from ..parallel.page_executor import map_pages
 
 
 def find_segment_for_token(token: PdfToken, segments: list[PdfSegment], tokens_by_segments):
@@ -77,12 +79,22 @@ def get_ordered_segments_for_page(segments_for_page: list[PdfSegment], page: Pdf
     return ordered_segments
 
 
+@timed_stage("reading_order")
 def get_reading_orders(pdf_images_list: list[PdfImages], predicted_segments: list[PdfSegment]):
     ordered_segments: list[PdfSegment] = []
     for pdf_images in pdf_images_list:
         pdf_name = pdf_images.pdf_features.file_name
         segments_for_file = [segment for segment in predicted_segments if segment.pdf_name == pdf_name]
-        for page in pdf_images.pdf_features.pages:
-            segments_for_page = [segment for segment in segments_for_file if segment.page_number == page.page_number]
-            ordered_segments.extend(get_ordered_segments_for_page(segments_for_page, page))
+        pages = pdf_images.pdf_features.pages
+        segments_by_page = [
+            [segment for segment in segments_for_file if segment.page_number == page.page_number] for page in pages
+        ]
+        segments_orders = map_pages(get_segments_order_for_page, pages, segments_by_page)
+        for segments_for_page, segments_order in zip(segments_by_page, segments_orders):
+            ordered_segments.extend(segments_for_page[index] for index in segments_order)
     return ordered_segments
+
+
+def get_segments_order_for_page(page: PdfPage, segments_for_page: list[PdfSegment]) -> list[int]:
+    index_by_segment = {id(segment): index for index, segment in enumerate(segments_for_page)}
+    return [index_by_segment[id(segment)] for segment in get_ordered_segments_for_page(segments_for_page, page)]
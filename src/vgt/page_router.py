@@ -0,0 +1,82 @@
+from statistics import median
+
+import numpy as np
+
+from ..data_model.PdfImages import PdfImages
+from ..fast_trainer.PdfSegment import PdfSegment
+from ..metrics.pipeline_metrics import count_page_route
+from ..pdf_features.PdfPage import PdfPage
+from ..pdf_features.Rectangle import Rectangle
+from ..pdf_token_type_labels.TokenType import TokenType
+from .adaptive_resolution import INK_THRESHOLD
+
+BLANK_PAGE_MAX_INK = 0.001
+SINGLE_BLOCK_MAX_TOKENS = 80
+SINGLE_BLOCK_MAX_LINE_GAP = 1.5
+
+
+def get_ink_box(page_image) -> tuple[Rectangle | None, float]:
+    """Box around the dark pixels and fraction of dark pixels. Pages are rendered at 72 dpi, pixels are PDF points"""
+    ink = np.asarray(page_image.convert("L")) < INK_THRESHOLD
+    if not ink.any():
+        return None, 0.0
+    rows = np.flatnonzero(ink.any(axis=1))
+    columns = np.flatnonzero(ink.any(axis=0))
+    ink_box = Rectangle.from_coordinates(int(columns[0]), int(rows[0]), int(columns[-1]) + 1, int(rows[-1]) + 1)
+    return ink_box, float(ink.mean())
+
+
+def has_gaps(intervals: list[tuple[int, int]], max_gap: float) -> bool:
+    intervals = sorted(intervals)
+    end = intervals[0][1]
+    for start, next_end in intervals[1:]:
+        if start - end > max_gap:
+            return True
+        end = max(end, next_end)
+    return False
+
+
+def is_single_block(page: PdfPage) -> bool:
+    """Few tokens in one font and one column, in lines without large vertical gaps"""
+    if len(page.tokens) > SINGLE_BLOCK_MAX_TOKENS:
+        return False
+    if len({(token.font.font_size, token.font.bold, token.font.italics) for token in page.tokens}) > 1:
+        return False
+    max_gap = SINGLE_BLOCK_MAX_LINE_GAP * median(token.bounding_box.height for token in page.tokens)
+    if has_gaps([(token.bounding_box.top, token.bounding_box.bottom) for token in page.tokens], max_gap):
+        return False
+    return not has_gaps([(token.bounding_box.left, token.bounding_box.right) for token in page.tokens], max_gap)
+
+
+def get_page_route(page: PdfPage, page_image) -> str:
+    """blank, image_only or single_block for the pages that do not need VGT, vgt for the others"""
+    if page.tokens:
+        return "single_block" if is_single_block(page) else "vgt"
+    _, ink_fraction = get_ink_box(page_image)
+    return "blank" if ink_fraction < BLANK_PAGE_MAX_INK else "image_only"
+
+
+def get_route_segments(route: str, page: PdfPage, page_image, pdf_name: str) -> list[PdfSegment]:
+    if route == "single_block":
+        segment = PdfSegment.from_pdf_tokens(page.tokens, pdf_name)
+        segment.segment_type = TokenType.TEXT
+        return [segment]
+    if route == "image_only":
+        ink_box, _ = get_ink_box(page_image)
+        return [PdfSegment(page.page_number, ink_box, "", TokenType.PICTURE, pdf_name)]
+    return []
+
+
+def get_routed_segments(pdf_images: PdfImages, excluded_pages: set[int]) -> dict[int, list[PdfSegment]]:
+    """Rule based segments of the trivial pages by page number. The pages not in the result go to VGT"""
+    routed_segments = {}
+    for page, page_image in zip(pdf_images.pdf_features.pages, pdf_images.pdf_images):
+        if page.page_number in excluded_pages:
+            continue
+        route = get_page_route(page, page_image)
+        count_page_route(route)
+        if route != "vgt":
+            routed_segments[page.page_number] = get_route_segments(
+                route, page, page_image, pdf_images.pdf_features.file_name
+            )
+    return routed_segments
@@ -0,0 +1,49 @@
+import os
+import tempfile
+
+import torch
+
+from ..cache.page_results_cache import get_models_fingerprint, VGT_MODEL_FILES
+from ..configuration import VGT_QUANTIZED_MODEL_PATH, service_logger
+from ..ditod.VGTTrainer import VGTTrainer
+from ..vgt.safetensors_weights import load_vgt_weights
+
+QUANTIZED_MODULE_TYPES = ["Block", "CrossBlock", "FeatureMerge", "FastRCNNConvFCHead"]
+
+
+def get_quantization_spec(model: torch.nn.Module) -> dict:
+    """The Linear layers of the transformer blocks, the feature merge and the ROI box heads. Not the embeddings"""
+    qconfig = torch.ao.quantization.default_dynamic_qconfig
+    return {name: qconfig for name, module in model.named_modules() if type(module).__name__ in QUANTIZED_MODULE_TYPES}
+
+
+def quantize_model(model: torch.nn.Module) -> torch.nn.Module:
+    model.eval()
+    return torch.ao.quantization.quantize_dynamic(model, get_quantization_spec(model), dtype=torch.qint8, inplace=True)
+
+
+def save_quantized_model(model: torch.nn.Module, source_fingerprint: str):
+    os.makedirs(VGT_QUANTIZED_MODEL_PATH.parent, exist_ok=True)
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=VGT_QUANTIZED_MODEL_PATH.parent)
+    with os.fdopen(file_descriptor, "wb") as file:
+        torch.save({"source": source_fingerprint, "model": model.state_dict()}, file)
+    os.replace(temporary_path, VGT_QUANTIZED_MODEL_PATH)
+
+
+def get_quantized_model(configuration) -> torch.nn.Module:
+    """INT8 dynamically quantized VGT for CPU. Quantized once from the FP32 weights and cached next to them"""
+    model = VGTTrainer.build_model(configuration)
+    source_fingerprint = get_models_fingerprint(VGT_MODEL_FILES)
+
+    if VGT_QUANTIZED_MODEL_PATH.exists():
+        checkpoint = torch.load(VGT_QUANTIZED_MODEL_PATH, map_location="cpu", weights_only=False)
+        if checkpoint["source"] == source_fingerprint:
+            quantize_model(model).load_state_dict(checkpoint["model"])
+            return model
+        service_logger.info("The FP32 VGT weights changed, quantizing them again")
+
+    load_vgt_weights(model, configuration)
+    quantize_model(model)
+    save_quantized_model(model, source_fingerprint)
+    service_logger.info(f"Quantized VGT model saved in {VGT_QUANTIZED_MODEL_PATH}")
+    return model
@@ -0,0 +1,73 @@
+import os
+import tempfile
+from pathlib import Path
+
+import torch
+from safetensors import safe_open
+from safetensors.torch import save_file
+
+from ..cache.page_results_cache import get_models_fingerprint
+from ..configuration import VGT_SAFETENSORS, service_logger
+from ..vgt.SafetensorsCheckpointer import SafetensorsCheckpointer
+
+WORD_EMBEDDINGS_FILE = "word_embeddings.safetensors"
+
+
+def is_converted(safetensors_path: Path, source_fingerprint: str) -> bool:
+    if not safetensors_path.exists():
+        return False
+    with safe_open(str(safetensors_path), framework="pt", device="cpu") as file:
+        return (file.metadata() or {}).get("source") == source_fingerprint
+
+
+def save_safetensors(tensors: dict[str, torch.Tensor], safetensors_path: Path, source_fingerprint: str) -> bool:
+    """Written next to the source file, False if the models volume is read only"""
+    try:
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=safetensors_path.parent)
+    except OSError as error:
+        service_logger.info(f"Could not write {safetensors_path.name}: {error}")
+        return False
+    os.close(file_descriptor)
+    try:
+        save_file(tensors, temporary_path, metadata={"source": source_fingerprint})
+        os.replace(temporary_path, safetensors_path)
+    except OSError as error:
+        service_logger.info(f"Could not write {safetensors_path.name}: {error}")
+        return False
+    finally:
+        Path(temporary_path).unlink(missing_ok=True)
+    return True
+
+
+def get_vgt_weights_path(weights_path: str) -> str:
+    """The safetensors copy of the VGT checkpoint, converted the first time. It is converted again if the checkpoint changes"""
+    safetensors_path = Path(weights_path).with_suffix(".safetensors")
+    source_fingerprint = get_models_fingerprint([weights_path])
+    if is_converted(safetensors_path, source_fingerprint):
+        return str(safetensors_path)
+
+    service_logger.info(f"Converting {Path(weights_path).name} to safetensors")
+    checkpoint = torch.load(weights_path, map_location="cpu", weights_only=False)
+    state_dict = checkpoint.get("model", checkpoint)
+    tensors = {name: torch.as_tensor(value).contiguous().clone() for name, value in state_dict.items()}
+    return str(safetensors_path) if save_safetensors(tensors, safetensors_path, source_fingerprint) else weights_path
+
+
+def load_vgt_weights(model: torch.nn.Module, configuration):
+    weights_path = get_vgt_weights_path(configuration.MODEL.WEIGHTS) if VGT_SAFETENSORS else configuration.MODEL.WEIGHTS
+    SafetensorsCheckpointer(model, save_dir=configuration.OUTPUT_DIR).resume_or_load(weights_path, resume=True)
+
+
+def get_word_embeddings(embedding_model_path: Path, key: str) -> torch.Tensor:
+    """The word embeddings of pytorch_model.bin, extracted the first time so the whole model is not loaded again"""
+    model_path = Path(embedding_model_path, "pytorch_model.bin")
+    word_embeddings_path = Path(embedding_model_path, WORD_EMBEDDINGS_FILE)
+    source_fingerprint = get_models_fingerprint([str(model_path)])
+    if VGT_SAFETENSORS and is_converted(word_embeddings_path, source_fingerprint):
+        with safe_open(str(word_embeddings_path), framework="pt", device="cpu") as file:
+            return file.get_tensor(key)
+
+    word_embeddings = torch.load(model_path, map_location="cpu", weights_only=True)[key]
+    if VGT_SAFETENSORS:
+        save_safetensors({key: word_embeddings.contiguous()}, word_embeddings_path, source_fingerprint)
+    return word_embeddings